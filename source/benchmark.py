@@ -0,0 +1,196 @@
+"""
+This module implements the benchmark suite of the model. Grids of increasing
+size are built with the constructor and the stages of the computation
+(distances, path enumeration, walking, integration, solve and solve_all) are
+timed across thresholds in 2D and 3D. Stages of a single solve are taken from
+the report of the profiler (solve with profile), so they are measured with
+memory tracing: walking with the kronrod integration, which walks every path,
+and other stages with the integration of the model (the prefix integration
+walks no path). Solve and solve_all are timed without the profiler. Results are written as JSON and may be
+compared with a stored baseline to flag regressions.
+
+Usage:
+    python -m source.benchmark --sizes 3 4 5 --thresholds 0 1 2 --output results.json
+    python -m source.benchmark --output results.json --compare baseline.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from source.constructor import Constructor
+from source.model import Model
+
+# Street values of benchmark networks
+LENGTH = 100
+WIDTH = 5
+ALPHA = 0.04
+BETA = 0.001
+
+# Stages of the computation (the first four are stages of the profiler)
+PROFILED_STAGES = ["distances", "paths", "walk", "integrate"]
+STAGES = PROFILED_STAGES + ["solve", "solve_all"]
+
+# Integrations of profiled solves of stages (the integration of the model
+# by default)
+STAGE_INTEGRATIONS = {"walk": "kronrod"}
+
+# Timings below the noise floor (in seconds) are never flagged as regressions
+NOISE_FLOOR = 1e-3
+
+def build_network(size, deletions=0):
+    """
+    This function builds the size by size grid and deletes the given number
+    of streets right of the middle column (one per inner row), so that the
+    network is not regular.
+    """
+    if deletions > max(size-2, 0):
+        raise ValueError("Too many deletions for the size of the grid.")
+    network = Constructor()
+    network.set_grid(size, size, LENGTH)
+    column = size//2 - 1
+    for row in range(1, deletions+1):
+        node = row*size + column # both junctions keep three streets
+        network.delete_connection(node, node+1)
+    network.modify_adjacency(WIDTH, ALPHA, BETA)
+    return network
+
+def time_stage(function, repeat):
+    """
+    This function returns the best time of the function in seconds and the
+    value returned by its last call.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return (best, value)
+
+def run_case(network, threshold, height, stages, repeat):
+    """
+    This function times the stages for the source (0, 1) and the receiver at
+    the opposite corner of the network. It returns the list of results.
+    """
+    nodes = len(network.get_adjacency())
+    def create_model(integration=None):
+        model = Model()
+        if integration is not None:
+            model.set_integration(integration)
+        model.set_adjacency(network.get_graph())
+        model.set_source(0, 1)
+        model.set_receiver(nodes-2, nodes-1)
+        model.set_threshold(threshold)
+        model.set_height(height)
+        return model
+
+    # Every profiled solve has a new model, so distances are not cached
+    profiled = [stage for stage in stages if stage in PROFILED_STAGES]
+    seconds = {stage: float("inf") for stage in profiled}
+    paths = None
+    for integration in dict.fromkeys(STAGE_INTEGRATIONS.get(stage) for stage in profiled):
+        group = [stage for stage in profiled
+                 if STAGE_INTEGRATIONS.get(stage) == integration]
+        for _ in range(repeat):
+            (power, error, paths, report) = create_model(integration).solve(
+                output="count", profile=True)
+            for stage in group: # stages which are not reached take no time
+                seconds[stage] = min(seconds[stage], report["stages"].get(
+                    stage, {"seconds": 0.0})["seconds"])
+
+    model = create_model()
+    functions = {
+        "solve": lambda: model.solve(output="count"),
+        "solve_all": lambda: model.solve_all(network.get_positions()),
+        }
+    for stage in stages:
+        if stage not in seconds:
+            (seconds[stage], _) = time_stage(functions[stage], repeat)
+    if paths is None: # number of paths of the case
+        (power, error, paths) = model.solve(output="count")
+    return [{"stage": stage, "seconds": seconds[stage], "paths": paths}
+            for stage in stages]
+
+def run(sizes, deletions, thresholds, heights, stages, repeat):
+    """
+    This function runs all cases and returns the dictionary of results along
+    with the description of the environment.
+    """
+    results = []
+    for size in sizes:
+        network = build_network(size, min(deletions, max(size-2, 0)))
+        for threshold in thresholds:
+            for height in heights:
+                for result in run_case(network, threshold, height, stages, repeat):
+                    result.update({"size": size, "deletions": deletions,
+                                   "threshold": threshold, "height": height})
+                    results.append(result)
+                    print("size {size} threshold {threshold} height {height} "
+                          "{stage}: {seconds:.6f} s ({paths} paths)".format(**result))
+    return {"python": platform.python_version(),
+            "numpy": np.__version__,
+            "results": results}
+
+def compare(results, baseline, tolerance):
+    """
+    This function compares results with the baseline and returns the list of
+    regressions (case, baseline seconds, seconds), where the time increased by
+    more than the tolerance (relative) and exceeds the noise floor.
+    """
+    def case(result):
+        return (result["size"], result["deletions"], result["threshold"],
+                result["height"], result["stage"])
+
+    reference = {case(result): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        key = case(result)
+        if key not in reference:
+            continue
+        if result["seconds"] > max(reference[key]*(1+tolerance), NOISE_FLOOR):
+            regressions.append((key, reference[key], result["seconds"]))
+    return regressions
+
+def main(arguments=None):
+    """
+    This function parses the command line arguments, runs the benchmark and
+    returns the exit status (1 if some regression is found).
+    """
+    parser = argparse.ArgumentParser(description="Benchmark of the model.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5])
+    parser.add_argument("--deletions", type=int, default=1,
+                        help="deleted streets of every grid")
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--heights", type=int, nargs="+", default=[0, 10],
+                        help="heights of buildings (0 for 2D)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file of results")
+    parser.add_argument("--compare", help="JSON file of baseline results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown flagged as regression")
+    arguments = parser.parse_args(arguments)
+
+    results = run(arguments.sizes, arguments.deletions, arguments.thresholds,
+                  arguments.heights, arguments.stages, arguments.repeat)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, arguments.tolerance)
+        for (case, before, after) in regressions:
+            print("Regression in size {0} deletions {1} threshold {2} height {3} "
+                  "{4}: {5:.6f} s -> {6:.6f} s".format(*case, before, after))
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
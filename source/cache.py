@@ -0,0 +1,124 @@
+"""
+This module implements the on-disk cache of contributions of paths. Entries
+are content-addressed by the hash of the network and the parameters of the
+problem, and the least recently used entries are evicted whenever the cache
+exceeds its size.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+# Default size of the cache in bytes
+CACHE_SIZE = 256*2**20
+
+def compute_key(*values):
+    """
+    This function returns the content address (SHA-256 hash) of the values,
+    which must be serialisable to JSON.
+    """
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+class Cache(object):
+    """
+    This class of methods stores entries (dictionaries of paths, energies and
+    errors) as JSON files named by their keys in the given directory.
+    """
+    def __init__(self, directory, size=CACHE_SIZE):
+        try:
+            size = int(size)
+        except ValueError:
+            raise ValueError("Size must be an integer.")
+        if size <= 0:
+            raise ValueError("Size must be a positive number.")
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__size = size
+
+    def get_directory(self):
+        """
+        This getter method returns the directory of the cache.
+        """
+        return self.__directory
+
+    def get_size(self):
+        """
+        This getter method returns the maximal size of the cache in bytes.
+        """
+        return self.__size
+
+    def get(self, key):
+        """
+        This method returns the entry stored under the key or None. The entry
+        becomes the most recently used one.
+        """
+        filename = self.__filename(key)
+        try:
+            with open(filename, "r") as file:
+                entry = json.load(file)
+            os.utime(filename)
+        except (FileNotFoundError, ValueError): # missing, evicted or corrupted
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """
+        This method stores the entry under the key and evicts the least
+        recently used entries if the cache exceeds its size. The file is
+        written atomically, so that several processes may share the cache.
+        """
+        (handle, temporary) = tempfile.mkstemp(dir=self.__directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as file:
+            json.dump(entry, file)
+        os.replace(temporary, self.__filename(key))
+        self.__evict()
+
+    def clear(self):
+        """
+        This method removes all entries from the cache.
+        """
+        for (filename, _, _) in self.__entries():
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    def __filename(self, key):
+        """
+        This private method returns the name of the file of the key.
+        """
+        return os.path.join(self.__directory, key + ".json")
+
+    def __entries(self):
+        """
+        This private method returns the list of (filename, size, time of last
+        use) of all entries.
+        """
+        entries = []
+        for name in os.listdir(self.__directory):
+            if not name.endswith(".json"):
+                continue
+            filename = os.path.join(self.__directory, name)
+            try:
+                status = os.stat(filename)
+            except FileNotFoundError: # evicted by another process
+                continue
+            entries.append((filename, status.st_size, status.st_mtime))
+        return entries
+
+    def __evict(self):
+        """
+        This private method removes the least recently used entries until the
+        cache fits its size.
+        """
+        entries = sorted(self.__entries(), key=lambda entry: entry[2])
+        total = sum(size for (_, size, _) in entries)
+        for (filename, size, _) in entries:
+            if total <= self.__size:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -32,6 +32,9 @@ class Menu(tk.Menu):
         self.file_menu.add_command(label="Export network",
                                    command=lambda: self.view.controller.file_click("export_network")
                                    )
+        self.file_menu.add_command(label="Save binary network",
+                                   command=lambda: self.view.controller.file_click("save_network")
+                                   )
         self.file_menu.add_command(label="Draw network",
                                    command=lambda: self.view.controller.file_click("draw_network")
                                    )
@@ -271,6 +271,11 @@ class ModelTools(tk.LabelFrame):
                                   command=self.compute_all_click
                                   )
         export_button.pack(side=tk.LEFT)
+        cancel_button = tk.Button(self,
+                                  text="Cancel",
+                                  command=self.cancel_click
+                                  )
+        cancel_button.pack(side=tk.LEFT)
 
     def compute_click(self):
         """
@@ -303,3 +308,9 @@ class ModelTools(tk.LabelFrame):
             height = False
         source = (starting_1, starting_2)
         self.view.controller.compute_all_click(source, threshold, height)
+
+    def cancel_click(self):
+        """
+        This method is triggered when the "cancel" button is clicked.
+        """
+        self.view.controller.cancel_click()
@@ -2,9 +2,13 @@
 This module constructs network of streets.
 """
 
+import bisect
 import numpy as np
 import json
 
+from source.graph import Graph
+from source import storage
+
 # Adobe flat UI colour scheme
 DARK_BLUE = "#2C3E50"
 MEDIUM_BLUE = "#2980B9"
@@ -45,8 +49,11 @@ class Constructor(object):
         self.__horizontals = None
         self.__verticals = None
         self.__nodes = None
-        self.__adjacency = None
-        self.__modified_adjacency = None
+        self.__neighbours = None # sets of neighbours of junctions
+        self.__deleted = [] # sorted junctions waiting for compaction
+        self.__adjacency = None # dense matrix built on demand
+        self.__streets = None # arrays of street values (by street index)
+        self.__modified_adjacency = None # dense matrix built on demand
         self.__positions = None
         self.__stage = 0
 
@@ -70,7 +77,10 @@ class Constructor(object):
         self.__horizontals = horizontals
         self.__verticals = verticals
         self.__nodes = horizontals*verticals
-        self.__adjacency = self.__create_adjacency()
+        self.__neighbours = self.__create_neighbours(self.__create_streets())
+        self.__deleted = []
+        self.__adjacency = None
+        self.__streets = None
         self.__modified_adjacency = None
         self.__positions = self.__create_positions(length)
         self.__stage = 1
@@ -83,36 +93,54 @@ class Constructor(object):
         self.__horizontals = None
         self.__verticals = None
         self.__nodes = None
+        self.__neighbours = None
+        self.__deleted = []
         self.__adjacency = None
+        self.__streets = None
         self.__modified_adjacency = None
         self.__positions = None
         self.__stage = 0
 
 
+    def __create_neighbours(self, ends):
+        """
+        This private method returns the list of sets of neighbours of
+        junctions connected by streets with the given ends.
+        """
+        neighbours = [set() for _ in range(self.__nodes)]
+        for (i, j) in ends.tolist():
+            neighbours[i].add(j)
+            neighbours[j].add(i)
+        return neighbours
+
     def __create_adjacency(self):
         """
-        This private method returns initial adjacency matrix.
-        """
-        adjacency = np.zeros((self.__nodes, self.__nodes), dtype=np.int)
-        # Normal adjacency matrix for grid network
-        for i in range(self.__nodes):
-            for j in range(self.__nodes):
-                if (j == i+1 and j%self.__verticals != 0) or \
-                   (j == i-1 and i%self.__verticals != 0) or \
-                    j == i+self.__verticals or \
-                    j == i-self.__verticals:
-                    adjacency[i][j] = 1
+        This private method returns the adjacency matrix built from sets of
+        neighbours (of the compacted network).
+        """
+        adjacency = np.zeros((self.__nodes, self.__nodes), dtype=int)
+        rows = np.repeat(np.arange(self.__nodes),
+                         [len(neighbours) for neighbours in self.__neighbours])
+        columns = [j for neighbours in self.__neighbours for j in neighbours]
+        adjacency[rows, np.array(columns, dtype=int)] = 1
         return adjacency
 
+    def __create_streets(self):
+        """
+        This private method returns the (streets, 2) array of junctions of
+        streets of the grid network (horizontal streets first).
+        """
+        nodes = np.arange(self.__nodes).reshape(self.__horizontals, self.__verticals)
+        horizontal = np.stack((nodes[:, :-1].ravel(), nodes[:, 1:].ravel()), axis=1)
+        vertical = np.stack((nodes[:-1, :].ravel(), nodes[1:, :].ravel()), axis=1)
+        return np.concatenate((horizontal, vertical))
+
     def __create_positions(self, length):
         """
         This private method returns initial positions matrix.
         """
-        positions = np.zeros((self.__nodes, 2))
-        for i in range(self.__nodes):
-            positions[i][0] = i%self.__verticals*length
-            positions[i][1] = i//self.__verticals*length
-        return positions
+        (rows, columns) = np.divmod(np.arange(self.__nodes), max(self.__verticals, 1))
+        return np.stack((columns*length, rows*length), axis=1).astype(float)
 
     def move_horizontal_line(self, i, length):
         """
@@ -121,9 +149,7 @@ class Constructor(object):
         assert self.__stage == 1
         if i not in range(self.__horizontals):
             raise ValueError("No such horizontal line.")
-        for node in range(self.__nodes):
-            if node//self.__verticals == i:
-                self.__positions[node][1] += length
+        self.__positions[i*self.__verticals:(i+1)*self.__verticals, 1] += length
 
     def move_vertical_line(self, j, length):
         """
@@ -132,59 +158,110 @@ class Constructor(object):
         assert self.__stage == 1
         if j not in range(self.__verticals):
             raise ValueError("No such vertical line.")
-        for node in range(self.__nodes):
-            if node%self.__verticals == j:
-                self.__positions[node][0] += length
+        self.__positions[j::self.__verticals, 0] += length
 
 
     def delete_connection(self, i, j):
         """
-        This method deletes the street (i, j).
+        This method deletes the street (i, j). Junctions left without streets
+        and junctions between two collinear streets (which are merged) are
+        removed. Junctions are numbered as if removed junctions were deleted
+        at once, but they are only compacted when the network is read.
         """
         if self.__stage == 1:
             self.__stage = 2 # set stage to 1 so lines cannot be moved
         assert self.__stage == 2
         if i not in range(self.__nodes) or j not in range(self.__nodes):
             raise ValueError("Nodes out of range.")
-        if self.__adjacency[i][j] == 0:
+        (i, j) = (self.__locate(i), self.__locate(j))
+        if j not in self.__neighbours[i]:
             raise ValueError("Junctions are not neighbours.")
-        self.__adjacency[i][j] = 0
-        self.__adjacency[j][i] = 0
-        to_delete = []
-        if sum(self.__adjacency[i]) == 2:
-            connections = []
-            for k in range(self.__nodes):
-                if self.__adjacency[i][k] == 1:
-                    connections.append(k)
-            if (self.__positions[i][0] == self.__positions[connections[0]][0] and \
-                self.__positions[i][0] == self.__positions[connections[1]][0]) or \
-               (self.__positions[i][1] == self.__positions[connections[0]][1] and \
-                self.__positions[i][1] == self.__positions[connections[1]][1]):
-                self.__adjacency[connections[0]][connections[1]] = 1
-                self.__adjacency[connections[1]][connections[0]] = 1
-                to_delete.append(i)
-        elif sum(self.__adjacency[i]) == 0:
-            to_delete.append(i)
-        if sum(self.__adjacency[j]) == 2:
-            connections = []
-            for k in range(self.__nodes):
-                if self.__adjacency[j][k] == 1:
-                    connections.append(k)
-            if (self.__positions[j][0] == self.__positions[connections[0]][0] and \
-                self.__positions[j][0] == self.__positions[connections[1]][0]) or \
-               (self.__positions[j][1] == self.__positions[connections[0]][1] and \
-                self.__positions[j][1] == self.__positions[connections[1]][1]):
-                self.__adjacency[connections[0]][connections[1]] = 1
-                self.__adjacency[connections[1]][connections[0]] = 1
-                to_delete.append(j)
-        elif sum(self.__adjacency[j]) == 0:
-            to_delete.append(j)
-        if len(to_delete) != 0:
-            self.__adjacency = np.delete(self.__adjacency, to_delete, axis=0)
-            self.__adjacency = np.delete(self.__adjacency, to_delete, axis=1)
-            self.__positions = np.delete(self.__positions, to_delete, axis=0)
-
-            self.__nodes = int(self.__nodes - len(to_delete))
+        self.__neighbours[i].remove(j)
+        self.__neighbours[j].remove(i)
+        to_delete = [node for node in [i, j] if self.__merge(node)]
+        for node in to_delete:
+            bisect.insort(self.__deleted, node)
+        self.__nodes = int(self.__nodes - len(to_delete))
+        self.__adjacency = None
+
+    def delete_connections(self, streets):
+        """
+        This method deletes many streets at once. Streets are pairs of
+        junctions numbered as if delete_connection was called for every pair
+        in turn. If some street cannot be deleted, no street is deleted.
+        Junctions are compacted once after all deletions.
+        """
+        streets = self.__validate_streets(streets)
+        state = ([set(neighbours) for neighbours in self.__neighbours],
+                 list(self.__deleted), self.__nodes, self.__stage)
+        try:
+            for (i, j) in streets.tolist():
+                self.delete_connection(i, j)
+        except ValueError:
+            (self.__neighbours, self.__deleted, self.__nodes, self.__stage) = state
+            raise
+        self.__compact()
+
+    def __validate_streets(self, streets):
+        """
+        This private method returns streets as the (streets, 2) array of
+        junctions and checks that all junctions are in range.
+        """
+        try:
+            streets = np.asarray(streets, dtype=np.int64).reshape(-1, 2)
+        except (TypeError, ValueError):
+            raise ValueError("Streets must be pairs of junctions.")
+        if np.any(streets < 0) or np.any(streets >= self.__nodes):
+            raise ValueError("Nodes out of range.")
+        return streets
+
+    def __merge(self, node):
+        """
+        This private method merges both streets of the junction with two
+        collinear streets. It returns True if the junction is to be removed
+        (merged or without streets).
+        """
+        neighbours = self.__neighbours[node]
+        if len(neighbours) == 2:
+            (first, second) = neighbours
+            positions = self.__positions
+            if (positions[node][0] == positions[first][0] and \
+                positions[node][0] == positions[second][0]) or \
+               (positions[node][1] == positions[first][1] and \
+                positions[node][1] == positions[second][1]):
+                for (neighbour, other) in [(first, second), (second, first)]:
+                    self.__neighbours[neighbour].remove(node)
+                    self.__neighbours[neighbour].add(other)
+                neighbours.clear()
+                return True
+        return len(neighbours) == 0
+
+    def __locate(self, node):
+        """
+        This private method returns the index of the junction in the network
+        with removed junctions which are not yet compacted.
+        """
+        index = node
+        while True: # smallest index with node junctions before it
+            shifted = node + bisect.bisect_right(self.__deleted, index)
+            if shifted == index:
+                return index
+            index = shifted
+
+    def __compact(self):
+        """
+        This private method removes deleted junctions and renumbers the rest
+        of junctions (once for any number of deletions).
+        """
+        if not self.__deleted:
+            return
+        kept = np.ones(len(self.__neighbours), dtype=bool)
+        kept[self.__deleted] = False
+        numbers = np.cumsum(kept) - 1 # new numbers of kept junctions
+        self.__neighbours = [{int(numbers[j]) for j in neighbours}
+                             for (neighbours, keep) in zip(self.__neighbours, kept) if keep]
+        self.__positions = self.__positions[kept]
+        self.__deleted = []
 
 
     def modify_adjacency(self, width, alpha, beta):
@@ -205,43 +282,95 @@ class Constructor(object):
             raise ValueError("Width must be a positive number.")
         if alpha < 0 or alpha > 1 or beta < 0 or beta > 1:
             raise ValueError("Absorption must be a number between 0 and 1.")
-        self.__modified_adjacency = self.__adjacency.tolist() # To python structure
-        positions = self.__positions
-        for i in range(self.__nodes):
-            for j in range(i):
-                if self.__adjacency[i][j] == 1:
-                    if positions[i][1] == positions[j][1]:
-                        length = abs(positions[i][0] - positions[j][0]).tolist()
-                        if positions[i][0] < positions[j][0]:
-                            orientation = 0
-                        elif positions[i][0] > positions[j][0]:
-                            orientation = 2
-                        else:
-                            raise ValueError("Points are at the same position.")
-                    elif positions[i][0] == positions[j][0]:
-                        length = abs(positions[i][1] - positions[j][1]).tolist()
-                        if positions[i][1] < positions[j][1]:
-                            orientation = 1
-                        elif positions[i][1] > positions[j][1]:
-                            orientation = 3
-                        else:
-                            raise ValueError("Points are at the same position.")
-
-                    else:
-                        raise ValueError("Points are not colinear.")
-
-                    self.__modified_adjacency[i][j] = {
-                        "alpha": alpha,
-                        "beta": beta,
-                        "width": width,
-                        "length": length,
-                        "orientation": orientation}
-                    self.__modified_adjacency[j][i] = {
-                        "alpha": alpha,
-                        "beta": beta,
-                        "width": width,
-                        "length": length,
-                        "orientation": (orientation+2)%4}
+        self.__compact()
+        ends = self.__get_ends()
+        first = self.__positions[ends[:, 0]]
+        second = self.__positions[ends[:, 1]]
+        horizontal = first[:, 1] == second[:, 1]
+        vertical = first[:, 0] == second[:, 0]
+        if np.any(horizontal & vertical):
+            raise ValueError("Points are at the same position.")
+        if not np.all(horizontal | vertical):
+            raise ValueError("Points are not colinear.")
+        lengths = np.where(horizontal, np.abs(second[:, 0] - first[:, 0]),
+                           np.abs(second[:, 1] - first[:, 1]))
+        # Orientation of the street seen from its first junction
+        orientations = np.where(horizontal,
+                                np.where(first[:, 0] < second[:, 0], 0, 2),
+                                np.where(first[:, 1] < second[:, 1], 1, 3))
+        streets = len(ends)
+        self.__set_streets(ends, lengths, np.full(streets, width),
+                           np.full(streets, alpha), np.full(streets, beta),
+                           orientations)
+
+    def __get_ends(self):
+        """
+        This private method returns the (streets, 2) array of junctions of
+        streets (the first junction is smaller), sorted by junctions.
+        """
+        ends = [(i, j) for (i, neighbours) in enumerate(self.__neighbours)
+                for j in sorted(neighbours) if i < j]
+        return np.array(ends, dtype=np.int64).reshape(-1, 2)
+
+    def __set_streets(self, ends, lengths, widths, alphas, betas, orientations):
+        """
+        This private method sets arrays of street values, indexed by streets
+        in the order of the sparse graph.
+        """
+        self.__streets = self.__create_street_values(
+            self.__nodes, ends, lengths, widths, alphas, betas, orientations)
+        self.__modified_adjacency = None
+
+    def __create_street_values(self, nodes, ends, lengths, widths, alphas, betas,
+                               orientations):
+        """
+        This private method returns the dictionary of arrays of street values
+        and keys of streets. Streets are stored with the smaller junction first
+        (orientations are reversed accordingly) and sorted by junctions, so
+        they can be found by binary search. Arrays which are already in this
+        order (e.g. memory-mapped arrays of loaded networks) are not copied.
+        """
+        streets = {
+            "ends": np.asarray(ends, dtype=np.int64).reshape(-1, 2),
+            "lengths": np.asarray(lengths, dtype=float),
+            "widths": np.array(widths, dtype=float),
+            "alphas": np.array(alphas, dtype=float),
+            "betas": np.array(betas, dtype=float),
+            "orientations": np.asarray(orientations, dtype=np.int64)
+            }
+        ends = streets["ends"]
+        if np.any(ends[:, 0] == ends[:, 1]):
+            raise ValueError("Street must connect two junctions.")
+        flipped = ends[:, 0] > ends[:, 1]
+        if np.any(flipped):
+            streets["ends"] = np.sort(ends, axis=1)
+            streets["orientations"] = np.where(flipped, (streets["orientations"]+2) % 4,
+                                               streets["orientations"])
+        keys = streets["ends"][:, 0]*nodes + streets["ends"][:, 1]
+        if np.any(np.diff(keys) <= 0):
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            if np.any(np.diff(keys) == 0):
+                raise ValueError("Streets must be unique.")
+            for key in streets:
+                streets[key] = streets[key][order]
+        streets["keys"] = keys
+        return streets
+
+    def __find_streets(self, streets):
+        """
+        This private method returns indices of streets given by pairs of
+        junctions and raises a ValueError if some junctions are not
+        neighbours.
+        """
+        keys = np.minimum(streets[:, 0], streets[:, 1])*self.__nodes + \
+               np.maximum(streets[:, 0], streets[:, 1])
+        indices = np.searchsorted(self.__streets["keys"], keys)
+        found = indices < len(self.__streets["keys"])
+        found[found] = self.__streets["keys"][indices[found]] == keys[found]
+        if not np.all(found):
+            raise ValueError("Junctions are not neighbours.")
+        return indices
 
     def unmodify_adjacency(self):
         """
@@ -249,6 +378,7 @@ class Constructor(object):
         construction.
         """
         self.__stage = 2
+        self.__streets = None
         self.__modified_adjacency = None
 
     def change_width(self, i, j, width):
@@ -264,11 +394,10 @@ class Constructor(object):
             raise ValueError("Width must be a positive number.")
         if i not in range(self.__nodes) or j not in range(self.__nodes):
             raise ValueError("Nodes out of range")
-        if self.__modified_adjacency[i][j] == 0:
-            raise ValueError("Junctions are not neighbours.")
+        street = self.__find_streets(np.array([[i, j]]))[0]
 
-        self.__modified_adjacency[i][j]["width"] = width
-        self.__modified_adjacency[j][i]["width"] = width
+        self.__streets["widths"][street] = width
+        self.__modified_adjacency = None
 
 
     def change_alpha(self, i, j, alpha):
@@ -284,11 +413,10 @@ class Constructor(object):
             raise ValueError("Absorption must be a number between 0 and 1")
         if i not in range(self.__nodes) or j not in range(self.__nodes):
             raise ValueError("Nodes out of range.")
-        if self.__modified_adjacency[i][j] == 0:
-            raise ValueError("Junctions are not neighbours.")
+        street = self.__find_streets(np.array([[i, j]]))[0]
 
-        self.__modified_adjacency[i][j]["alpha"] = alpha
-        self.__modified_adjacency[j][i]["alpha"] = alpha
+        self.__streets["alphas"][street] = alpha
+        self.__modified_adjacency = None
 
     def change_beta(self, i, j, beta):
         """
@@ -303,11 +431,47 @@ class Constructor(object):
             raise ValueError("Absorption must be a number between 0 and 1")
         if i not in range(self.__nodes) or j not in range(self.__nodes):
             raise ValueError("Nodes out of range.")
-        if self.__modified_adjacency[i][j] == 0:
-            raise ValueError("Junctions are not neighbours.")
+        street = self.__find_streets(np.array([[i, j]]))[0]
 
-        self.__modified_adjacency[i][j]["beta"] = beta
-        self.__modified_adjacency[j][i]["beta"] = beta
+        self.__streets["betas"][street] = beta
+        self.__modified_adjacency = None
+
+    def change_streets(self, streets, widths=None, alphas=None, betas=None):
+        """
+        This method changes street widths, wall absorptions and air
+        absorptions of many streets at once (values of None are kept). All
+        streets and values are validated before any street is changed and the
+        result is the same as changing the streets one by one.
+        """
+        assert self.__stage == 3
+        streets = self.__validate_streets(streets)
+        changes = {}
+        for (key, values) in [("width", widths), ("alpha", alphas), ("beta", betas)]:
+            if values is None:
+                continue
+            try:
+                values = np.asarray(values, dtype=float)
+            except (TypeError, ValueError):
+                if key == "width":
+                    raise ValueError("Width must be a floating point number.")
+                raise ValueError("Absorption must be a floating point number.")
+            if values.ndim == 0: # the same value for all streets
+                values = np.full(len(streets), values)
+            if values.shape != (len(streets),):
+                raise ValueError("Values must be given for every street.")
+            if key == "width" and np.any(values <= 0):
+                raise ValueError("Width must be a positive number.")
+            if key != "width" and np.any((values < 0) | (values > 1)):
+                raise ValueError("Absorption must be a number between 0 and 1")
+            changes[key] = values
+        indices = self.__find_streets(streets)
+
+        # The last change of every street is applied
+        (indices, last) = np.unique(indices[::-1], return_index=True)
+        last = len(streets) - 1 - last
+        for (key, values) in changes.items():
+            self.__streets[key + "s"][indices] = values[last]
+        self.__modified_adjacency = None
 
     def get_horizontals(self):
         """
@@ -325,18 +489,44 @@ class Constructor(object):
         """
         This getter method returns the normal adjacency matrix.
         """
+        if self.__neighbours is None:
+            return None
+        self.__compact()
+        if self.__adjacency is None:
+            self.__adjacency = self.__create_adjacency()
         return self.__adjacency
 
     def get_modified_adjacency(self):
         """
-        This getter method returns the modified adjacency matrix.
+        This getter method returns the modified adjacency matrix with
+        dictionaries of keys (alpha, beta, street width, street length,
+        orientation). The matrix is built from street values for backward
+        compatibility.
         """
+        if self.__streets is None:
+            return None
+        if self.__modified_adjacency is None:
+            self.__modified_adjacency = self.get_graph().to_modified_adjacency()
         return self.__modified_adjacency
 
+    def get_graph(self):
+        """
+        This getter method returns the sparse graph of the modified network.
+        Street values are copied, so later changes do not affect the graph.
+        """
+        if self.__streets is None:
+            return None
+        streets = self.__streets
+        return Graph(self.__nodes, streets["ends"], streets["lengths"],
+                     streets["widths"].copy(), streets["alphas"].copy(),
+                     streets["betas"].copy(), streets["orientations"])
+
     def get_positions(self):
         """
         This getter method returns the positions matrix.
         """
+        if self.__neighbours is not None:
+            self.__compact()
         return self.__positions
 
     def get_stage(self):
@@ -350,13 +540,47 @@ class Constructor(object):
         This method is used to import existing network from the invalues
         dictionary.
         """
-        self.__horizontals = invalues["horizontals"]
-        self.__verticals = invalues["verticals"]
-        self.__nodes = invalues["nodes"]
-        self.__adjacency = np.array(invalues["adjacency"])
-        self.__modified_adjacency = invalues["modified_adjacency"]
-        self.__positions = np.array(invalues["positions"])
-        self.__stage = invalues["stage"]
+        self.__set_network(storage.from_json(invalues))
+
+    def __set_network(self, network):
+        """
+        This private method sets the network from the dictionary of scalars,
+        positions, ends and arrays of street values (of modified networks).
+        Streets are validated before the current network is replaced.
+        """
+        streets = None
+        if "widths" in network:
+            streets = self.__create_street_values(
+                network["nodes"], network["ends"], network["lengths"], network["widths"],
+                network["alphas"], network["betas"], network["orientations"])
+        self.__horizontals = network["horizontals"]
+        self.__verticals = network["verticals"]
+        self.__nodes = network["nodes"]
+        self.__neighbours = self.__create_neighbours(np.asarray(network["ends"]))
+        self.__deleted = []
+        self.__adjacency = None
+        self.__streets = streets
+        self.__modified_adjacency = None
+        self.__positions = np.array(network["positions"], dtype=float)
+        self.__stage = network["stage"]
+
+    def __get_network(self):
+        """
+        This private method returns the dictionary of scalars, positions,
+        ends and arrays of street values (of modified networks).
+        """
+        self.__compact()
+        network = {"horizontals": self.__horizontals,
+                   "verticals": self.__verticals,
+                   "nodes": self.__nodes,
+                   "stage": self.__stage,
+                   "positions": self.__positions}
+        if self.__streets is None:
+            network["ends"] = self.__get_ends()
+        else:
+            for key in ["ends", "lengths", "widths", "alphas", "betas", "orientations"]:
+                network[key] = self.__streets[key]
+        return network
 
     def export_network(self, filename):
         """
@@ -367,14 +591,30 @@ class Constructor(object):
                 "horizontals": self.__horizontals,
                 "verticals": self.__verticals,
                 "nodes": self.__nodes,
-                "adjacency": self.__adjacency.tolist(),
-                "modified_adjacency": self.__modified_adjacency,
-                "positions": self.__positions.tolist(),
+                "adjacency": self.get_adjacency().tolist(),
+                "modified_adjacency": self.get_modified_adjacency(),
+                "positions": self.get_positions().tolist(),
                 "stage": self.__stage
                 }
         with open(filename, "w") as file:
             json.dump(data, file)
 
+    def load_network(self, filename):
+        """
+        This method is used to load existing network from the binary file
+        (arrays of the file are memory-mapped) or from the JSON file (read as
+        a stream without building dense matrices). The format is detected from
+        the content of the file.
+        """
+        self.__set_network(storage.read_network(filename))
+
+    def save_network(self, filename):
+        """
+        This method is used to save currently constructed network to the
+        binary file.
+        """
+        storage.save_network(filename, self.__get_network())
+
     def draw_network(self, filename, results=False):
         """
         This method outputs file "output.html" with svg drawing of network and
@@ -427,12 +667,12 @@ style='fill: {2}; font-size: {3}'>{4}</text>\n".format(x+OFFSET,
                                 text
                                 )
 
-        positions = self.__positions
+        positions = self.get_positions()
         if self.__stage == 3:
-            adjacency = self.__modified_adjacency
+            adjacency = self.get_modified_adjacency()
             modified = True
         else:
-            adjacency = self.__adjacency
+            adjacency = self.get_adjacency()
             modified = False
 
         with open(filename, "w") as file:
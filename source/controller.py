@@ -1,16 +1,28 @@
-import json
 import os
+import queue
+import threading
+import zipfile
+
+from source.monitor import Cancelled, ProgressMonitor
+
+# Interval of polling the background computation (in milliseconds)
+POLL_INTERVAL = 100
 
 class Controller(object):
     """
     This class implements the "controller" part of the MVC architectural
     pattern.
     """
-    def __init__(self, constructor, model, view):
+    def __init__(self, constructor, model, view, tracking=False):
         self.constructor = constructor
         self.model = model
         self.view = view
 
+        # Re-solve only paths affected by customised streets (tracked paths
+        # of solutions are kept in memory)
+        if tracking:
+            self.model.set_tracking(True)
+
         self.view.register(self) # Give "view" object access to controller
 
         # canvas bind variables
@@ -19,6 +31,11 @@ class Controller(object):
         self.modified = False
         self.selected = False
 
+        # background computation variables
+        self.computation = None
+        self.monitor = None # monitor of the running computation
+        self.messages = queue.Queue()
+
     def done_creating(self, horizontals, verticals, length):
         try:
             self.constructor.set_grid(horizontals, verticals, length)
@@ -178,25 +195,36 @@ class Controller(object):
                                  )
 
     def compute_click(self, source, receiver, threshold, height):
+        if self.computation is not None:
+            self.view.show_message("Error", "Computation is already running.")
+            return
         (starting_1, starting_2) = source
         (ending_1, ending_2) = receiver
-        self.model.set_adjacency(self.constructor.get_modified_adjacency())
+        self.model.set_adjacency(self.constructor.get_graph())
         try:
             self.model.set_source(starting_1, starting_2)
             self.model.set_receiver(ending_1, ending_2)
             self.model.set_threshold(threshold)
             self.model.set_height(height)
-            (power, error, paths) = self.model.solve()
         except ValueError as e:
             self.view.show_message("Error", e)
             return
+        # Paths are counted in advance to estimate the remaining time
+        self.__start(lambda: self.model.solve(output="count"), self.__show_result,
+                     count_paths=True)
+
+    def __show_result(self, result):
+        (power, error, count) = result
         power = format(power*100, '.3f')
         error = format(error*100, '.3f')
         self.view.show_message("Result", "Mean square pressure: {0} % ± {1} %".format(power, error))
 
     def compute_all_click(self, source, threshold, height):
+        if self.computation is not None:
+            self.view.show_message("Error", "Computation is already running.")
+            return
         starting_1, starting_2 = source
-        self.model.set_adjacency(self.constructor.get_modified_adjacency())
+        self.model.set_adjacency(self.constructor.get_graph())
         try:
             self.model.set_source(starting_1, starting_2)
             self.model.set_threshold(threshold)
@@ -204,14 +232,89 @@ class Controller(object):
         except ValueError as e:
             self.view.show_message("Error", e)
             return
-        results = self.model.solve_all(self.constructor.get_positions())
+        positions = self.constructor.get_positions()
+        self.__start(lambda: self.model.solve_all(positions, processes=os.cpu_count() or 1),
+                     self.__draw_results)
+
+    def __draw_results(self, results):
         filename = self.view.save_as(".html")
         if filename is None:
             return
         self.constructor.draw_network(filename, results)
 
+    def cancel_click(self):
+        if self.computation is None:
+            return
+        self.monitor.get_token().cancel()
+        self.view.show_status("Cancelling...")
+
+    def __start(self, computation, done, count_paths=False):
+        """
+        This private method runs the computation on a worker thread, so that
+        the window stays responsive. Progress and the result are delivered to
+        the main thread by polling.
+        """
+        self.monitor = ProgressMonitor(count_paths=count_paths)
+        def run():
+            try:
+                self.messages.put(("result", computation()))
+            except Cancelled:
+                self.messages.put(("cancelled", None))
+            except Exception as e:
+                self.messages.put(("error", e))
+
+        self.model.set_monitor(self.monitor)
+        self.computation = threading.Thread(target=run, daemon=True)
+        self.computation.start()
+        self.view.show_status("Computing...")
+        self.view.after(POLL_INTERVAL, self.__poll, done)
+
+    def __poll(self, done):
+        """
+        This private method shows the progress of the computation and delivers
+        its result once the worker thread is finished.
+        """
+        try:
+            (kind, value) = self.messages.get_nowait()
+        except queue.Empty:
+            if not self.monitor.get_token().is_cancelled():
+                self.view.show_status(self.__format_progress())
+            self.view.after(POLL_INTERVAL, self.__poll, done)
+            return
+        self.computation.join()
+        self.computation = None
+        self.monitor = None
+        self.model.set_monitor(None)
+        self.view.show_status("")
+        if kind == "result":
+            done(value)
+        elif kind == "cancelled":
+            self.view.show_status("Computation cancelled.")
+        else:
+            self.view.show_message("Error", value)
+
+    def __format_progress(self):
+        """
+        This private method returns the description of the progress.
+        """
+        progress = self.monitor.get_progress()
+        parts = []
+        for stage in ["receivers", "paths"]:
+            if stage in progress:
+                (count, total) = progress[stage]
+                if total is None: # paths are not counted in advance
+                    parts.append("{0} {1}".format(stage, count))
+                else:
+                    parts.append("{0} {1}/{2}".format(stage, count, total))
+        stage = "receivers" if "receivers" in progress else "paths"
+        eta = self.monitor.get_eta(stage)
+        if eta is not None:
+            parts.append("{0:.0f} s remaining".format(eta))
+        return "Computing... " + ", ".join(parts)
+
     def file_click(self, option):
-        if option in ["export_network", "draw_network"] and self.constructor.get_stage() == 0:
+        if option in ["export_network", "save_network", "draw_network"] and \
+           self.constructor.get_stage() == 0:
             return
         if option == "import_network":
             filename = self.view.open()
@@ -225,6 +328,12 @@ class Controller(object):
                 return
             self.constructor.export_network(filename)
 
+        elif option == "save_network":
+            filename = self.view.save_as(".npz")
+            if filename is None:
+                return
+            self.constructor.save_network(filename)
+
         elif option == "draw_network":
             filename = self.view.save_as(".html")
             if filename is None:
@@ -251,11 +360,12 @@ class Controller(object):
                                  )
 
     def __import_network(self, filename):
-        with open(filename, "r") as file:
-            invalues = json.load(file)
-        modified_adjacency = invalues["modified_adjacency"]
-        self.constructor.import_network(invalues)
-        if modified_adjacency is None:
+        try: # binary (.npz) or JSON network file
+            self.constructor.load_network(filename)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            self.view.show_message("Error", e)
+            return
+        if self.constructor.get_graph() is None:
             self.view.switch_tools("ModifyingTools")
             self.modified = False
             self.view.remove_binds()
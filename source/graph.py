@@ -0,0 +1,274 @@
+"""
+This module implements the sparse representation of the network of streets.
+Junctions and streets are stored in the compressed sparse row (CSR) format
+along with parallel arrays of street values (length, width, alpha, beta and
+orientation), so that memory is proportional to the number of streets.
+"""
+
+import hashlib
+import itertools
+import numpy as np
+
+# Distance of junctions not connected to the root
+UNREACHABLE = -1
+
+# Every constructed graph gets a new version
+VERSIONS = itertools.count()
+
+class Graph(object):
+    """
+    This class of methods stores the network of streets as a sparse graph.
+    Every street (i, j) is stored once in the street arrays (lengths, widths,
+    alphas and betas) and twice as a directed edge (i -> j and j -> i) in the
+    CSR arrays (indptr, indices, edge streets and orientations).
+    """
+    def __init__(self, nodes, ends, lengths, widths, alphas, betas, orientations):
+        """
+        The street (ends[k][0], ends[k][1]) has the length lengths[k], the
+        width widths[k], the wall absorption alphas[k], the air absorption
+        betas[k] and the orientation orientations[k] (seen from the first
+        junction).
+        """
+        self.__nodes = int(nodes)
+        self.__ends = np.asarray(ends, dtype=np.int64).reshape(-1, 2)
+        self.__lengths = np.asarray(lengths, dtype=float)
+        self.__widths = np.asarray(widths, dtype=float)
+        self.__alphas = np.asarray(alphas, dtype=float)
+        self.__betas = np.asarray(betas, dtype=float)
+        orientations = np.asarray(orientations, dtype=np.int64)
+
+        streets = len(self.__ends)
+        for values in [self.__lengths, self.__widths, self.__alphas,
+                       self.__betas, orientations]:
+            if len(values) != streets:
+                raise ValueError("Street arrays must be of the same length.")
+        if streets and (self.__ends.min() < 0 or self.__ends.max() >= self.__nodes):
+            raise ValueError("Nodes out of range.")
+
+        # Every street appears as two directed edges
+        sources = np.concatenate((self.__ends[:, 0], self.__ends[:, 1]))
+        targets = np.concatenate((self.__ends[:, 1], self.__ends[:, 0]))
+        edge_streets = np.concatenate((np.arange(streets), np.arange(streets)))
+        edge_orientations = np.concatenate((orientations, (orientations+2)%4))
+
+        order = np.lexsort((targets, sources))
+        self.__indices = targets[order]
+        self.__edge_streets = edge_streets[order]
+        self.__orientations = edge_orientations[order]
+        counts = np.bincount(sources, minlength=self.__nodes)
+        self.__indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        self.__version = next(VERSIONS)
+
+    @classmethod
+    def from_modified_adjacency(cls, modified_adjacency):
+        """
+        This method creates the graph from the (dense) modified adjacency
+        matrix with dictionaries of keys (alpha, beta, width, length,
+        orientation).
+        """
+        nodes = len(modified_adjacency)
+        ends = []
+        values = []
+        for i in range(nodes):
+            row = modified_adjacency[i]
+            for j in range(i+1, nodes):
+                street = row[j]
+                if street != 0:
+                    ends.append((i, j))
+                    values.append((street["length"], street["width"],
+                                   street["alpha"], street["beta"],
+                                   street["orientation"]))
+        values = np.array(values, dtype=float).reshape(-1, 5)
+        return cls(nodes, ends, values[:, 0], values[:, 1], values[:, 2],
+                   values[:, 3], values[:, 4].astype(np.int64))
+
+    def to_modified_adjacency(self):
+        """
+        This method builds the (dense) modified adjacency matrix for backward
+        compatibility.
+        """
+        modified_adjacency = [[0]*self.__nodes for _ in range(self.__nodes)]
+        for i in range(self.__nodes):
+            for edge in range(self.__indptr[i], self.__indptr[i+1]):
+                street = self.__edge_streets[edge]
+                modified_adjacency[i][int(self.__indices[edge])] = {
+                    "alpha": float(self.__alphas[street]),
+                    "beta": float(self.__betas[street]),
+                    "width": float(self.__widths[street]),
+                    "length": float(self.__lengths[street]),
+                    "orientation": int(self.__orientations[edge])}
+        return modified_adjacency
+
+    def get_version(self):
+        """
+        This getter method returns the version of the graph, which identifies
+        the graph in caches.
+        """
+        return self.__version
+
+    def get_fingerprint(self):
+        """
+        This method returns the hash of the network (junctions, streets and
+        their values), which identifies equal networks across sessions.
+        """
+        fingerprint = hashlib.sha256(np.int64(self.__nodes).tobytes())
+        for values in [self.__ends, self.__lengths, self.__widths, self.__alphas,
+                       self.__betas, self.__orientations]:
+            fingerprint.update(np.ascontiguousarray(values).tobytes())
+        return fingerprint.hexdigest()
+
+    def get_nodes(self):
+        """
+        This getter method returns the number of junctions.
+        """
+        return self.__nodes
+
+    def get_streets(self):
+        """
+        This getter method returns the number of streets.
+        """
+        return len(self.__ends)
+
+    def get_ends(self):
+        """
+        This getter method returns the array of street endpoints.
+        """
+        return self.__ends
+
+    def get_indptr(self):
+        """
+        This getter method returns the CSR row pointer array.
+        """
+        return self.__indptr
+
+    def get_indices(self):
+        """
+        This getter method returns the CSR array of neighbouring junctions.
+        """
+        return self.__indices
+
+    def get_edge_streets(self):
+        """
+        This getter method returns the street index of every directed edge.
+        """
+        return self.__edge_streets
+
+    def get_orientations(self):
+        """
+        This getter method returns the orientation of every directed edge.
+        """
+        return self.__orientations
+
+    def get_street_orientations(self):
+        """
+        This method returns the orientation of every street seen from its
+        first junction.
+        """
+        sources = np.repeat(np.arange(self.__nodes), np.diff(self.__indptr))
+        first = sources == self.__ends[self.__edge_streets, 0]
+        orientations = np.zeros(len(self.__ends), dtype=np.int64)
+        orientations[self.__edge_streets[first]] = self.__orientations[first]
+        return orientations
+
+    def get_lengths(self):
+        """
+        This getter method returns the array of street lengths.
+        """
+        return self.__lengths
+
+    def get_widths(self):
+        """
+        This getter method returns the array of street widths.
+        """
+        return self.__widths
+
+    def get_alphas(self):
+        """
+        This getter method returns the array of wall absorptions.
+        """
+        return self.__alphas
+
+    def get_betas(self):
+        """
+        This getter method returns the array of air absorptions.
+        """
+        return self.__betas
+
+    def set_width(self, street, width):
+        """
+        This setter method changes the width of the street. Values of streets
+        do not change the version, since distances only depend on topology.
+        """
+        self.__widths[street] = width
+
+    def set_alpha(self, street, alpha):
+        """
+        This setter method changes the wall absorption of the street.
+        """
+        self.__alphas[street] = alpha
+
+    def set_beta(self, street, beta):
+        """
+        This setter method changes the air absorption of the street.
+        """
+        self.__betas[street] = beta
+
+    def get_neighbours(self, node):
+        """
+        This method returns the array of junctions neighbouring the node.
+        """
+        return self.__indices[self.__indptr[node]:self.__indptr[node+1]]
+
+    def get_edge(self, i, j):
+        """
+        This method returns the index of the directed edge i -> j or -1 if the
+        junctions are not neighbours.
+        """
+        if i < 0 or i >= self.__nodes:
+            return -1
+        start, end = self.__indptr[i], self.__indptr[i+1]
+        position = start + np.searchsorted(self.__indices[start:end], j)
+        if position < end and self.__indices[position] == j:
+            return int(position)
+        return -1
+
+    def has_edge(self, i, j):
+        """
+        This method returns True if the junctions i and j are neighbours.
+        """
+        return self.get_edge(i, j) != -1
+
+    def get_street(self, i, j):
+        """
+        This method returns the index of the street (i, j) and raises a
+        ValueError if the junctions are not neighbours.
+        """
+        edge = self.get_edge(i, j)
+        if edge == -1:
+            raise ValueError("Junctions are not neighbours.")
+        return int(self.__edge_streets[edge])
+
+    def distances(self, root):
+        """
+        This method returns the array of shortest distances (number of streets)
+        from the root junction to all junctions. Since all streets count as a
+        single step, the breadth-first search is used level by level.
+        Junctions which are not connected to the root have distance
+        UNREACHABLE.
+        """
+        distances = np.full(self.__nodes, UNREACHABLE, dtype=np.int32)
+        distances[root] = 0
+        frontier = np.array([root], dtype=np.int64)
+        level = 0
+        while len(frontier) != 0:
+            level += 1
+            starts = self.__indptr[frontier]
+            counts = self.__indptr[frontier+1] - starts
+            # Indices of all edges leaving the frontier
+            edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + \
+                    np.arange(counts.sum())
+            neighbours = np.unique(self.__indices[edges])
+            frontier = neighbours[distances[neighbours] == UNREACHABLE]
+            distances[frontier] = level
+        return distances
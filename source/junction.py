@@ -4,6 +4,34 @@ This module implements some common-type junctions.
 
 import numpy as np
 
+# Kernels of junction probability distribution functions
+CONSTANT = 0
+CROSSING = 1
+TURNING = 2
+
+def crossing(theta, ratio):
+    """
+    This function returns the probability of crossing the junction (FC) on an
+    array of angles.
+    """
+    return np.clip(1-ratio*np.tan(theta), 0, 1)
+
+def turning(theta, ratio):
+    """
+    This function returns the probability of turning at the junction (FT) on
+    an array of angles.
+    """
+    return 0.5*np.clip(ratio*np.tan(theta), 0, 1)
+
+def transfer(kernels, scales, ratios, theta):
+    """
+    This function evaluates junction probability distribution functions given
+    by arrays of kernels, scales and ratios on arrays of angles. All arguments
+    are broadcast against each other.
+    """
+    return scales*np.where(kernels==CROSSING, crossing(theta, ratios),
+                           np.where(kernels==TURNING, turning(theta, ratios), 1))
+
 class Junction(object):
     """
     This class of methods instantiates a junction object on which wave
@@ -12,7 +40,7 @@ class Junction(object):
 
     def __init__(self, widths, current):
         self.__junction = None
-        self.__define_junction(widths)
+        self.__define_junction(widths, current)
         self.__validate_junction(widths, current)
 
         self.__next = widths["next"] # left, forward, right or backward
@@ -20,10 +48,7 @@ class Junction(object):
         exiting = widths[widths["next"]] # width of exiting street
         self.__ratio = exiting/entry # ratio needed for future computations
 
-        self.__crossing = lambda theta, ratio: max(1-ratio*np.tan(theta), 0) # FC
-        self.__turning = lambda theta, ratio: 0.5*min(ratio*np.tan(theta), 1) # FT
-
-    def __define_junction(self, widths):
+    def __define_junction(self, widths, current):
         """
         This private method defines junction type based on input widths.
         """
@@ -42,37 +67,75 @@ class Junction(object):
         else:
             raise ValueError("No such junction type. (junction {0})".format(current))
 
-    def compute_function(self):
+    def get_junction(self):
         """
-        This method returns lambda function for a given junction based on
-        street widths and junction type.
+        This getter method returns the junction type.
+        """
+        return self.__junction
+
+    def get_ratio(self):
+        """
+        This getter method returns the ratio of exiting and entry widths.
+        """
+        return self.__ratio
+
+    def compute_kernel(self):
+        """
+        This method returns the tuple (kernel, scale, ratio) describing the
+        probability distribution function of the junction, which equals
+        scale*crossing(theta, ratio) for the CROSSING kernel,
+        scale*turning(theta, ratio) for the TURNING kernel and scale for the
+        CONSTANT kernel.
         """
         if self.__junction == "dead-end":
-            return lambda theta: 1
+            return (CONSTANT, 1, 0)
         elif self.__junction == "bend":
             if self.__next == "backward":
-                return lambda theta: self.__crossing(theta, self.__ratio)
+                return (CROSSING, 1, self.__ratio)
             else:
-                return lambda theta: 2*self.__turning(theta, self.__ratio)
+                return (TURNING, 2, self.__ratio)
         elif self.__junction == "t-junction":
             if self.__next == "backward":
-                return lambda theta: self.__crossing(theta, 2*self.__ratio)
+                return (CROSSING, 1, 2*self.__ratio)
             else:
-                return lambda theta: self.__turning(theta, 2*self.__ratio)
+                return (TURNING, 1, 2*self.__ratio)
         elif self.__junction == "side-street":
             if self.__next == "forward":
-                return lambda theta: self.__crossing(theta, 0.5*self.__ratio)
+                return (CROSSING, 1, 0.5*self.__ratio)
             elif self.__next == "backward":
-                return lambda theta: 0
+                return (CONSTANT, 0, 0)
             else:
-                return lambda theta: 2*self.__turning(theta, 0.5*self.__ratio)
+                return (TURNING, 2, 0.5*self.__ratio)
         elif self.__junction == "crossroads":
             if self.__next == "forward":
-                return lambda theta: self.__crossing(theta, self.__ratio)
+                return (CROSSING, 1, self.__ratio)
             elif self.__next == "backward":
-                return lambda theta: 0
+                return (CONSTANT, 0, 0)
             else:
-                return lambda theta: self.__turning(theta, self.__ratio)
+                return (TURNING, 1, self.__ratio)
+
+    def compute_function(self):
+        """
+        This method returns the probability distribution function for a given
+        junction based on street widths and junction type. The function
+        accepts both scalar angles and arrays of angles.
+        """
+        (kernel, scale, ratio) = self.compute_kernel()
+        if kernel == CROSSING:
+            return lambda theta: scale*crossing(theta, ratio)
+        elif kernel == TURNING:
+            return lambda theta: scale*turning(theta, ratio)
+        return lambda theta: scale*np.ones_like(theta)
+
+    def compute_breaking_point(self):
+        """
+        This method returns the angle at which the function of the junction is
+        not smooth or None if the function is constant.
+        """
+        (kernel, scale, ratio) = self.compute_kernel()
+        if kernel == CONSTANT:
+            return None
+        return np.arctan(1/ratio)
 
     def correct_orientation(self):
         """
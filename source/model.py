@@ -3,11 +3,99 @@ This module performs probabilistic model on some network of streets given by
 the modified adjacency matrix (with dictionary of length, width, alpha, beta,
 orientation).
 """
+import heapq
+import itertools
+import logging
+import multiprocessing
+import time
+import tracemalloc
 import numpy as np
 import scipy.integrate as integrate
-from collections import defaultdict
+import scipy.sparse as sparse
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
-from source.junction import Junction
+from source.junction import Junction, transfer
+from source.graph import Graph, UNREACHABLE
+from source import quadrature
+from source.cache import compute_key
+from source.monitor import Cancelled, CancellationToken, Monitor
+from source.profiler import Profiler
+
+# Contributions of paths are logged at the DEBUG level and results at INFO
+logger = logging.getLogger(__name__)
+
+# Maximal number of cached distance arrays
+DISTANCES_CACHE_SIZE = 1024
+
+# Number of Gauss-Kronrod panels between two breaking points
+SUBDIVISIONS = 4
+
+# Batched integration: paths per batch, initial number of panels of the shared
+# grid and number of refinements
+BATCH_SIZE = 256
+BATCH_SUBDIVISIONS = 8
+BATCH_REFINEMENTS = 2
+
+# Prefix-sharing integration: number of panels of the fixed grid between
+# breaking points
+PREFIX_SUBDIVISIONS = 4
+
+# Maximal number of panels of the grid of angles shared by all paths (prefix
+# integration, source and transfer engines). The grid is split at breaking
+# points of all junctions, so networks with many different ratios of widths
+# integrate paths on their own panels instead
+GRID_MAX_PANELS = 512
+
+# Transfer engine: number of panels between breaking points and number of
+# transitions multiplied at once
+TRANSFER_SUBDIVISIONS = 4
+TRANSFER_BLOCK = 4096
+
+# Relative tolerance of the error estimate on shared grids of angles
+TOLERANCE = 1e-8
+
+# Maximal number of tracked solutions (per-path contributions of solve)
+TRACKING_CACHE_SIZE = 16
+
+# Number of batches of receivers per process in parallel solve_all
+RECEIVER_BATCHES = 4
+
+# Interval of checking cancellation while waiting for batches (in seconds)
+CANCELLATION_INTERVAL = 0.1
+
+# Model of the worker process (set once per worker by initialize_worker)
+WORKER_MODEL = None
+
+def initialize_worker(model, cancelled=None):
+    """
+    This function stores the model (with the network) in the worker process.
+    The shared event cancelled (if given) is checked by the model between
+    paths.
+    """
+    global WORKER_MODEL
+    if cancelled is not None:
+        model.set_monitor(Monitor(CancellationToken(cancelled)))
+    WORKER_MODEL = model
+
+def solve_receivers(receivers, model=None):
+    """
+    This function solves the problem for every receiver of the batch with the
+    given model (by default the model of the worker process) and returns the
+    list of ((power, error, count), elapsed time) tuples. If the computation
+    is cancelled, only the receivers solved so far are returned.
+    """
+    model = WORKER_MODEL if model is None else model
+    powers = []
+    for receiver in receivers:
+        start = time.perf_counter()
+        model.set_receiver(*receiver) # * unpacks tuple
+        try:
+            powers.append((model.solve(output="count"), time.perf_counter() - start))
+        except Cancelled:
+            break
+    return powers
 
 class Model(object):
     """
@@ -15,33 +103,155 @@ class Model(object):
     energy propagation.
     """
     def __init__(self):
-        self.__modified_adjacency = None
         self.__nodes = None
         self.__graph = None
         self.__source = None
         self.__receiver = None
         self.__threshold = None
         self.__height = False
+        self.__integration = "prefix"
+        self.__engine = "paths"
+        self.__distances = OrderedDict()
+        self.__junctions = None
+        self.__panels = {} # shared grids of angles by numbers of subdivisions
+        self.__tracking = False
+        self.__tracked = OrderedDict()
+        self.__cache = None
+        self.__monitor = None
+        self.__profiler = None # set only while solving with profile
 
     def set_adjacency(self, modified_adjacency):
         """
-        This setter method sets the adjacency matrix of the network.
+        This setter method sets the network either from the sparse graph or
+        from the (dense) modified adjacency matrix. If contributions of paths
+        are tracked and the network only differs in widths and absorptions of
+        streets, the streets are changed one by one, so that tracked solutions
+        are kept.
         """
-        self.__modified_adjacency = modified_adjacency
-        self.__nodes = len(modified_adjacency)
-        self.__set_graph(modified_adjacency)
+        if isinstance(modified_adjacency, Graph):
+            graph = modified_adjacency
+        else:
+            graph = Graph.from_modified_adjacency(modified_adjacency)
+        if self.__tracking and self.__same_topology(graph):
+            for street in range(graph.get_streets()):
+                (i, j) = self.__graph.get_ends()[street].tolist()
+                if graph.get_widths()[street] != self.__graph.get_widths()[street]:
+                    self.change_width(i, j, graph.get_widths()[street])
+                if graph.get_alphas()[street] != self.__graph.get_alphas()[street]:
+                    self.change_alpha(i, j, graph.get_alphas()[street])
+                if graph.get_betas()[street] != self.__graph.get_betas()[street]:
+                    self.change_beta(i, j, graph.get_betas()[street])
+            return
+        self.__graph = graph
+        self.__nodes = graph.get_nodes()
+        self.__distances.clear()
+        self.__tracked.clear()
+        self.__set_junctions()
 
-    def __set_graph(self, modified_adjacency):
+    def __same_topology(self, graph):
         """
-        This method returns normal adjacency matrix from modified adjacency
-        matrix.
+        This private method checks whether the graph has the same junctions,
+        streets, lengths and orientations as the current network.
         """
-        graph = defaultdict(set)
-        for i in range(self.__nodes):
-            for j in range(self.__nodes):
-                if modified_adjacency[i][j] != 0:
-                    graph[i].add(j)
-        self.__graph = graph
+        current = self.__graph
+        return (current is not None and current is not graph and
+                graph.get_nodes() == current.get_nodes() and
+                np.array_equal(graph.get_ends(), current.get_ends()) and
+                np.array_equal(graph.get_lengths(), current.get_lengths()) and
+                np.array_equal(graph.get_orientations(), current.get_orientations()))
+
+    def set_tracking(self, tracking):
+        """
+        This setter method enables tracking of contributions of paths. Solutions
+        of solve are stored along with indices of paths by streets and
+        junctions they pass. After a change of some street, solving the same
+        problem again only re-integrates the paths which pass the street (or
+        its junctions if the width is changed) and patches the totals.
+        """
+        self.__tracking = bool(tracking)
+        if not self.__tracking:
+            self.__tracked.clear()
+
+    def set_monitor(self, monitor):
+        """
+        This setter method sets the monitor (or None) of computations. The
+        monitor receives the number of paths (if it counts paths in advance),
+        contributions of integrated paths and results of solved receivers with
+        timing. Its cancellation token is checked between paths (also while
+        they are counted) and receivers, and the computation is
+        stopped by raising Cancelled with the partial results.
+        """
+        self.__monitor = monitor
+
+    def set_cache(self, cache):
+        """
+        This setter method sets the on-disk cache (or None) of contributions of
+        paths. Contributions are stored per network, source, receiver, height
+        and integration method, so that solving the problem again (with the
+        same or another threshold) only integrates paths which are not stored.
+        """
+        self.__cache = cache
+
+    def change_width(self, i, j, width):
+        """
+        This method changes the width of the street (i, j).
+        """
+        street = self.__graph.get_street(i, j)
+        try:
+            width = float(width)
+        except ValueError:
+            raise ValueError("Width must be a floating point number.")
+        if width <= 0:
+            raise ValueError("Width must be a positive number.")
+        self.__graph.set_width(street, width)
+        self.__set_junctions([i, j]) # widths determine both junctions
+        self.__invalidate(street, [i, j])
+
+    def change_alpha(self, i, j, alpha):
+        """
+        This method changes the wall absorption of the street (i, j).
+        """
+        street = self.__graph.get_street(i, j)
+        try:
+            alpha = float(alpha)
+        except ValueError:
+            raise ValueError("Absorption must be a floating point number.")
+        if alpha < 0 or alpha > 1:
+            raise ValueError("Absorption must be a number between 0 and 1")
+        self.__graph.set_alpha(street, alpha)
+        self.__invalidate(street, [])
+
+    def change_beta(self, i, j, beta):
+        """
+        This method changes the air absorption of the street (i, j).
+        """
+        street = self.__graph.get_street(i, j)
+        try:
+            beta = float(beta)
+        except ValueError:
+            raise ValueError("Absorption must be a floating point number.")
+        if beta < 0 or beta > 1:
+            raise ValueError("Absorption must be a number between 0 and 1")
+        self.__graph.set_beta(street, beta)
+        self.__invalidate(street, [])
+
+    def __invalidate(self, street, nodes):
+        """
+        This private method marks tracked paths which pass the street or some
+        of the junctions for re-integration.
+        """
+        for solution in self.__tracked.values():
+            stale = solution["stale"]
+            stale.update(solution["streets"].get(street, []))
+            for node in nodes:
+                stale.update(solution["nodes"].get(node, []))
+
+    def get_modified_adjacency(self):
+        """
+        This getter method returns the (dense) modified adjacency matrix of the
+        network. The matrix is built on demand for backward compatibility.
+        """
+        return self.__graph.to_modified_adjacency()
 
     def set_source(self, source1, source2):
         """
@@ -56,7 +266,7 @@ class Model(object):
             raise ValueError("First source node not in range.")
         if source2 < 0 or source2 > self.__nodes:
             raise ValueError("Second source node not in range.")
-        if source2 not in self.__graph[source1]:
+        if not self.__graph.has_edge(source1, source2):
             raise ValueError("Sources are not neighbours.")
         self.__source = (source1, source2)
 
@@ -73,7 +283,7 @@ class Model(object):
             raise ValueError("First receiver node not in range.")
         if receiver2 < 0 or receiver2 > self.__nodes:
             raise ValueError("Second receiver node not in range.")
-        if receiver2 not in self.__graph[receiver1]:
+        if not self.__graph.has_edge(receiver1, receiver2):
             raise ValueError("Receivers are not neighbours.")
         self.__receiver = (receiver1, receiver2)
 
@@ -101,36 +311,237 @@ class Model(object):
         else:
             self.__height = height
 
-    def solve(self):
+    def set_integration(self, integration):
+        """
+        This setter method sets the integration method. The "kronrod" method
+        evaluates the integrand of every path on arrays of angles with the
+        composite Gauss-Kronrod rule. Its results agree with the adaptive
+        "quad" method within the error estimate reported by quad (relative
+        difference below 1e-9 when quad is run with tight tolerances). The
+        "batch" method integrates batches of paths at once on a shared grid
+        and refines only inaccurate paths. The "prefix" method (default)
+        evaluates paths on a fixed grid split at breaking points of all
+        junctions as a prefix tree, so that common prefixes of paths are
+        evaluated once. Since the grid grows with the number of different
+        ratios of widths in the network, paths are integrated with the
+        "kronrod" method if the grid has more than GRID_MAX_PANELS panels.
+        """
+        if integration not in ["batch", "prefix", "kronrod", "quad"]:
+            raise ValueError("No such integration method.")
+        self.__integration = integration
+
+    def set_engine(self, engine):
+        """
+        This setter method sets the engine of solve_all. The "paths" engine
+        (default) solves the problem once per receiver. The "source" engine
+        grows walks from the source only once and adds the contribution of
+        every walk to all receiver streets it reaches within their cutoffs.
+        It integrates on the fixed grid of the "prefix" method and gives zero
+        power to receivers which are not reachable from the source. The
+        "transfer" engine sums walks with the same last street and rotation
+        on a fixed grid of angles and propagates these sums street by street,
+        so its cost is linear in the number of steps and streets. It gives the
+        same results as the "source" engine, but only in 2D. Both engines
+        integrate walks on their own panels if the grid has more than
+        GRID_MAX_PANELS panels.
+        """
+        if engine not in ["paths", "source", "transfer"]:
+            raise ValueError("No such engine.")
+        self.__engine = engine
+
+    def solve(self, output="paths", top=10, profile=False):
         """
         This method is the main method of the class and solves the wave
-        propagation problem.
+        propagation problem. Paths are consumed one by one and the power is
+        accumulated on the fly. The output argument selects what is returned
+        along with the power and the error: "paths" returns the list of all
+        paths, "count" returns only the number of paths and "top" returns the
+        list of (energy, path) pairs of the top strongest paths. In the last
+        two modes memory does not depend on the number of paths (unless
+        contributions of paths are tracked). If profile is True, the report of
+        the profiler is returned as the fourth element.
         """
         assert self.__source is not None and self.__receiver is not None and self.__threshold is not None
-        paths = self.__compute_paths() # obtain all connecting paths
-        print("Number of paths is {}".format(len(paths)))
+        if output not in ["paths", "count", "top"]:
+            raise ValueError("No such output.")
+        if profile:
+            return self.__solve_profiled(output, top)
+        key = (self.__source, self.__receiver, self.__threshold, self.__height,
+               self.__integration)
+        if self.__tracking and key in self.__tracked:
+            self.__tracked.move_to_end(key)
+            contributions = self.__update_solution(self.__tracked[key])
+            solution = None
+        else:
+            if self.__cache is not None:
+                contributions = self.__cached_contributions()
+            else:
+                contributions = self.__integrate_paths(self.__compute_paths())
+            solution = {"paths": [], "energies": [], "errors": []} if self.__tracking else None
+        profiler = self.__profiler
+        if profiler is not None:
+            contributions = profiler.iterate("integrate", contributions)
+        paths = []
+        strongest = [] # heap of (energy, index, path) tuples
+        count = 0
         power = 0
         error = 0
-        for path in paths:
-            integrand = self.__walk(path) # obtain functions and breaking points
-            (part_power, part_error) = self.__integrate(integrand)
+        monitor = self.__monitor
+        total = None
+        if monitor is not None:
+            if monitor.counts_paths(): # enumerate paths in advance
+                total = 0
+                for _ in self.__compute_paths():
+                    total += 1
+                    monitor.check((power, error, count))
+            monitor.paths_counted(total)
+        for (path, part_power, part_error) in contributions:
             power += part_power
             error += part_error
-        print("==========================================")
-        print("Resulting power from node {0} to node {1} is {2} (error {3})".format(
-            self.__source, self.__receiver, power, error))
+            if output == "paths":
+                paths.append(path)
+            elif output == "top":
+                if len(strongest) < top:
+                    heapq.heappush(strongest, (part_power, count, path))
+                elif part_power > strongest[0][0]:
+                    heapq.heapreplace(strongest, (part_power, count, path))
+            if solution is not None:
+                solution["paths"].append(path)
+                solution["energies"].append(part_power)
+                solution["errors"].append(part_error)
+            count += 1
+            if profiler is not None:
+                profiler.finish_path()
+            if monitor is not None:
+                monitor.path_integrated(path, part_power, part_error, count, total)
+                monitor.check((power, error, count))
+        if solution is not None:
+            self.__track(key, solution)
+        logger.info("Resulting power from node %s to node %s is %s (error %s, %d paths)",
+                    self.__source, self.__receiver, power, error, count)
+        if output == "count":
+            return (power, error, count)
+        elif output == "top":
+            strongest = sorted(strongest, reverse=True)
+            return (power, error, [(energy, path) for (energy, _, path) in strongest])
         return (power, error, paths) # resulting power flow
 
+    def __solve_profiled(self, output, top):
+        """
+        This private method solves the problem with the profiler and returns
+        the result of solve with the report of the profiler. Allocated bytes
+        are traced with tracemalloc (started here if it is not tracing).
+        """
+        self.__profiler = Profiler()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = self.solve(output, top)
+            report = self.__profiler.get_report()
+            report["seconds"] = time.perf_counter() - start
+        finally:
+            self.__profiler = None
+            if not tracing:
+                tracemalloc.stop()
+        return result + (report,)
+
+    def __stage(self, name):
+        """
+        This private method returns the context manager measuring the stage
+        (it does nothing unless the profiler is set).
+        """
+        if self.__profiler is None:
+            return nullcontext()
+        return self.__profiler.stage(name)
+
+    def __count(self, evaluations):
+        """
+        This private method counts integrand evaluations of the current path
+        (it does nothing unless the profiler is set).
+        """
+        if self.__profiler is not None:
+            self.__profiler.count(evaluations)
+
+    def __track(self, key, solution):
+        """
+        This private method stores the solution with indices of its paths by
+        streets and by junctions (where junction functions are evaluated).
+        """
+        streets = {}
+        nodes = {}
+        for (index, path) in enumerate(solution["paths"]):
+            for (i, j) in zip(path[:-1], path[1:]):
+                streets.setdefault(self.__graph.get_street(i, j), []).append(index)
+            for node in path[1:-1]:
+                nodes.setdefault(node, []).append(index)
+        solution["streets"] = streets
+        solution["nodes"] = nodes
+        solution["stale"] = set()
+        self.__tracked[key] = solution
+        if len(self.__tracked) > TRACKING_CACHE_SIZE:
+            self.__tracked.popitem(last=False)
+
+    def __update_solution(self, solution):
+        """
+        This private method re-integrates the stale paths of the tracked
+        solution and generates triples (path, energy, error) of all paths.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG) # skip formatting of paths
+        for index in sorted(solution["stale"]):
+            path = solution["paths"][index]
+            (energy, error) = self.__integrate(self.__fill(path))
+            if debug:
+                logger.debug("Contribution from path %s: %s (error %s)",
+                             path, energy, error)
+            solution["energies"][index] = energy
+            solution["errors"][index] = error
+        solution["stale"].clear()
+        return zip(solution["paths"], solution["energies"], solution["errors"])
+
+    def __cached_contributions(self):
+        """
+        This private method generates triples (path, energy, error) of all
+        paths, where only paths which are not stored in the cache are
+        integrated. New contributions are added to the cache entry.
+        """
+        key = compute_key(self.__graph.get_fingerprint(), self.__source,
+                          self.__receiver, self.__height, self.__integration)
+        entry = self.__cache.get(key)
+        if entry is None:
+            entry = {"paths": [], "energies": [], "errors": []}
+        stored = {tuple(path[1:-1]): index for (index, path) in enumerate(entry["paths"])}
+
+        paths = list(self.__compute_paths())
+        missing = [list(path) for path in paths if tuple(path) not in stored]
+        evaluations = {} # integrand evaluations of missing paths
+        for (path, energy, error) in self.__integrate_paths(iter(missing)):
+            if self.__profiler is not None:
+                evaluations[tuple(path[1:-1])] = self.__profiler.take()
+            stored[tuple(path[1:-1])] = len(entry["paths"])
+            entry["paths"].append(path)
+            entry["energies"].append(energy)
+            entry["errors"].append(error)
+        if missing:
+            self.__cache.put(key, entry)
+
+        for path in paths:
+            index = stored[tuple(path)]
+            self.__count(evaluations.get(tuple(path), 0))
+            yield (entry["paths"][index], entry["energies"][index], entry["errors"][index])
+
     def __compute_paths(self):
         """
-        This private method computes all paths between source and receiver.
+        This private method generates all paths between source and receiver.
         """
         lengths = []
-        paths = []
         # Find lengths of all four combinations
         for source in self.__source:
             for receiver in self.__receiver:
-                lengths.append(self.__dijkstra(source)[receiver])
+                lengths.append(self.__get_distances(receiver)[source])
+        if max(lengths) == UNREACHABLE:
+            raise ValueError("Receiver is not reachable from source.")
         # Find minimal length and compute cutoff
         shortest_length = min(lengths)
         cutoff = shortest_length + self.__threshold
@@ -138,49 +549,60 @@ class Model(object):
         # Find all paths of lengths up to cutoff of all four combinations
         for source in self.__source:
             for receiver in self.__receiver:
-                paths.extend(self.__find_paths(source, receiver, cutoff+1))
-        return paths
+                paths = self.__find_paths(source, receiver, cutoff)
+                if self.__profiler is not None:
+                    paths = self.__profiler.iterate("paths", paths)
+                yield from paths
 
+    def __find_paths(self, source, receiver, cutoff):
+        """
+        This private method generates all paths between source and receiver
+        with at most cutoff streets. The depth-first search is iterative, the
+        common prefix of the paths is kept in a single path buffer and the
+        search only descends into junctions from which the receiver can still
+        be reached within the cutoff.
+        """
+        distances = self.__get_distances(receiver)
+        if distances[source] == UNREACHABLE or distances[source] > cutoff:
+            return
+        indptr = self.__graph.get_indptr()
+        indices = self.__graph.get_indices()
+
+        path = [source]
+        edges = [indptr[source]] # next edge to explore at each depth
+        if source == receiver:
+            yield list(path)
+        while edges:
+            edge = edges[-1]
+            if edge == indptr[path[-1]+1]: # all neighbours explored
+                path.pop()
+                edges.pop()
+                continue
+            edges[-1] = edge + 1
+            neighbor = int(indices[edge])
+            # Prune before descending (len(path) is the depth of the neighbor)
+            if len(path) + distances[neighbor] > cutoff:
+                continue
+            path.append(neighbor)
+            edges.append(indptr[neighbor])
+            if neighbor == receiver:
+                yield list(path)
 
-    def __find_paths(self, element, receiver, n, distances=False):
+    def __get_distances(self, root):
         """
-        This private method implements an algorithm for finding all paths
-        between source and receiver of specified length.
+        This private method returns the array of shortest distances from the
+        root junction. Arrays are cached per graph version and root, so that
+        they are computed once per network rather than once per receiver.
         """
-        # Compute distances dictionary only the first time
-        if not distances:
-            distances = self.__dijkstra(receiver)
-        paths = []
-        # Recursive algorithm
-        if n > 0:
-            for neighbor in self.__graph[element]:
-                for path in self.__find_paths(neighbor, receiver, n-1, distances):
-                    if distances[element] < n:
-                        paths.append([element]+path)
-        # Only append path if the last element is the receiver node
-        if element == receiver:
-            paths.append([element])
-        return paths
-
-    def __dijkstra(self, source):
-        distances = {source: 0}    # Shortest lengths dictionary
-        nodes = set(self.__graph)    # Set of graph nodes
-        while nodes:
-            min_node = None
-            for node in nodes:
-                if node in distances:
-                    if min_node is None:
-                        min_node = node
-                    elif distances[node] < distances[min_node]:
-                        min_node = node
-            if min_node is None:
-                break
-            nodes.remove(min_node)
-            current_length = distances[min_node]
-            for edge in self.__graph[min_node]:
-                length = current_length + 1
-                if edge not in distances or length < distances[edge]:
-                    distances[edge] = length
+        key = (self.__graph.get_version(), root)
+        if key in self.__distances:
+            self.__distances.move_to_end(key)
+            return self.__distances[key]
+        with self.__stage("distances"):
+            distances = self.__graph.distances(root)
+        self.__distances[key] = distances
+        if len(self.__distances) > DISTANCES_CACHE_SIZE:
+            self.__distances.popitem(last=False)
         return distances
 
     def __walk(self, path):
@@ -191,16 +613,8 @@ class Model(object):
         # Prepend "apparent" source
         if path[0] == self.__source[0]:
             path.insert(0, self.__source[1])
-            lengths = [self.__modified_adjacency[path[0]][path[1]]["length"]/2]
         else:
             path.insert(0, self.__source[0])
-            lengths = [self.__modified_adjacency[path[0]][path[1]]["length"]/2]
-
-        # Fill width, alpha and rotation of the first street
-        widths = [self.__modified_adjacency[path[0]][path[1]]["width"]]
-        alphas = [self.__modified_adjacency[path[0]][path[1]]["alpha"]]
-        betas = [self.__modified_adjacency[path[0]][path[1]]["beta"]]
-        rotations = [0]
 
         # Append "apparent" receiver
         if path[-1] == self.__receiver[0]:
@@ -208,72 +622,335 @@ class Model(object):
         else:
             path.append(self.__receiver[0])
 
-        # Set empty array of functions and breaking points
-        functions = []
-
-        # Iterate through the rest of the path
-        for i in range(1, len(path)-1):
-            previous, current, following = path[i-1], path[i], path[i+1]
-
-            # Get widths of appropriately rotated junction
-            rotated_widths = self.__rotate(previous, current, following)
-            junction = Junction(rotated_widths, current)
-            functions.append(junction.compute_function())
-
-            # Add length, alpha and rotation of the following street
-            lengths.append(self.__modified_adjacency[current][following]["length"])
-            widths.append(self.__modified_adjacency[current][following]["width"])
-            alphas.append(self.__modified_adjacency[current][following]["alpha"])
-            betas.append(self.__modified_adjacency[current][following]["beta"])
-            rotations.append((rotations[-1]+junction.correct_orientation())%2)
-
-        # Last length is only half
-        lengths[-1] = lengths[-1]/2
-
-        return {"path": path,
-                "functions": functions,
-                "rotations": rotations,
-                "lengths": lengths,
-                "widths": widths,
-                "alphas": alphas,
-                "betas": betas
-                }
+        return self.__fill(path)
+
+    def __fill(self, path):
+        """
+        This private method fills the functions and other street values at each
+        step of the path, which includes the "apparent" source and receiver.
+        """
+        with self.__stage("walk"):
+            graph = self.__graph
+            lengths_array = graph.get_lengths()
+            widths_array = graph.get_widths()
+            alphas_array = graph.get_alphas()
+            betas_array = graph.get_betas()
+
+            street = graph.get_street(path[0], path[1])
+            lengths = [lengths_array[street]/2]
+
+            # Fill width, alpha and rotation of the first street
+            widths = [widths_array[street]]
+            alphas = [alphas_array[street]]
+            betas = [betas_array[street]]
+            rotations = [0]
+
+            # Set empty array of functions and breaking points
+            functions = []
+            kernels = []
+            breaking_points = []
+
+            # Iterate through the rest of the path
+            for i in range(1, len(path)-1):
+                previous, current, following = path[i-1], path[i], path[i+1]
+
+                # Get precomputed junction
+                junction = self.__get_junction(previous, current, following)
+                functions.append(junction["function"])
+                kernels.append(junction["kernel"])
+                breaking_point = junction["breaking_point"]
+                if breaking_point is not None: # rotate as the entering street
+                    breaking_points.append(
+                        np.pi/2-breaking_point if rotations[-1]==1 else breaking_point)
+
+                # Add length, alpha and rotation of the following street
+                street = graph.get_street(current, following)
+                lengths.append(lengths_array[street])
+                widths.append(widths_array[street])
+                alphas.append(alphas_array[street])
+                betas.append(betas_array[street])
+                rotations.append((rotations[-1]+junction["turn"])%2)
+
+            # Last length is only half
+            lengths[-1] = lengths[-1]/2
+
+            return {"path": path,
+                    "functions": functions,
+                    "kernels": kernels,
+                    "breaking_points": breaking_points,
+                    "rotations": rotations,
+                    "lengths": lengths,
+                    "widths": widths,
+                    "alphas": alphas,
+                    "betas": betas
+                    }
+
+    def __set_junctions(self, nodes=None):
+        """
+        This private method precomputes the junction table of the network. The
+        table is keyed by (previous, current, following) junctions and stores
+        the junction type, the ratio of widths, the change of orientation, the
+        kernel of the probability distribution function (kernel, scale, ratio),
+        the function itself and its breaking point.
+        Junctions which are not implemented store the error message, which is
+        only raised when some path passes the junction. If nodes are given,
+        only their junctions are recomputed.
+        """
+        indptr = self.__graph.get_indptr()
+        indices = self.__graph.get_indices().tolist()
+        if nodes is None:
+            junctions = {}
+            nodes = range(self.__nodes)
+        else:
+            junctions = self.__junctions
+        for current in nodes:
+            neighbours = indices[indptr[current]:indptr[current+1]]
+            for previous in neighbours:
+                for following in neighbours:
+                    key = (previous, current, following)
+                    try:
+                        junction = Junction(
+                            self.__rotate(previous, current, following), current)
+                    except ValueError as e:
+                        junctions[key] = {"error": str(e)}
+                        continue
+                    junctions[key] = {
+                        "junction": junction.get_junction(),
+                        "ratio": junction.get_ratio(),
+                        "turn": junction.correct_orientation(),
+                        "kernel": junction.compute_kernel(),
+                        "function": junction.compute_function(),
+                        "breaking_point": junction.compute_breaking_point()
+                        }
+        self.__junctions = junctions
+        self.__panels.clear()
+
+    def __get_junction(self, previous, current, following):
+        """
+        This private method returns the precomputed junction and raises a
+        ValueError if the junction is not implemented.
+        """
+        junction = self.__junctions[(previous, current, following)]
+        if "error" in junction:
+            raise ValueError(junction["error"])
+        return junction
 
     def __rotate(self, previous, current, following):
         """
         This private method determines the orientation of the junction and
         provides information on street widths and exiting street.
         """
-        orientation = self.__modified_adjacency[current][previous]["orientation"]
+        graph = self.__graph
+        indptr = graph.get_indptr()
+        indices = graph.get_indices()
+        orientations = graph.get_orientations()
+        edge_streets = graph.get_edge_streets()
+        widths = graph.get_widths()
+
+        orientation = orientations[graph.get_edge(current, previous)]
         backward = orientation
         right = (orientation+1)%4
         forward = (orientation+2)%4
         left = (orientation+3)%4
         rotated = {}
-        for neighbor in self.__graph[current]:
-            if self.__modified_adjacency[current][neighbor]["orientation"] == left:
-                rotated["left"] = self.__modified_adjacency[current][neighbor]["width"]
+        for edge in range(indptr[current], indptr[current+1]):
+            neighbor = indices[edge]
+            width = widths[edge_streets[edge]]
+            if orientations[edge] == left:
+                rotated["left"] = width
                 if following == neighbor:
                     rotated["next"] = "left"
-            elif self.__modified_adjacency[current][neighbor]["orientation"] == forward:
-                rotated["forward"] = self.__modified_adjacency[current][neighbor]["width"]
+            elif orientations[edge] == forward:
+                rotated["forward"] = width
                 if following == neighbor:
                     rotated["next"] = "forward"
-            elif self.__modified_adjacency[current][neighbor]["orientation"] == right:
-                rotated["right"] = self.__modified_adjacency[current][neighbor]["width"]
+            elif orientations[edge] == right:
+                rotated["right"] = width
                 if following == neighbor:
                     rotated["next"] = "right"
-            elif self.__modified_adjacency[current][neighbor]["orientation"] == backward:
-                rotated["backward"] = self.__modified_adjacency[current][neighbor]["width"]
+            elif orientations[edge] == backward:
+                rotated["backward"] = width
                 if following == neighbor:
                     rotated["next"] = "backward"
         return rotated
 
+    def __integrate_paths(self, paths):
+        """
+        This private method walks and integrates the paths one by one or in
+        batches and generates triples (path, energy, error). The "prefix"
+        method integrates paths one by one with the "kronrod" method if the
+        shared grid of angles has too many panels.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG) # skip formatting of paths
+        integration = self.__integration
+        if integration == "prefix" and self.__get_panels(PREFIX_SUBDIVISIONS) is None:
+            integration = "kronrod"
+        if integration == "prefix":
+            yield from self.__integrate_prefix(paths)
+        elif integration == "batch":
+            batch = []
+            for path in itertools.chain(paths, [None]):
+                if path is not None:
+                    batch.append(self.__walk(path)) # obtain functions and breaking points
+                if len(batch) == BATCH_SIZE or (path is None and batch):
+                    (energies, errors, evaluations) = self.__integrate_batch(batch)
+                    for (integrand, energy, error, evaluation) in zip(
+                            batch, energies, errors, evaluations):
+                        self.__count(evaluation)
+                        if debug:
+                            logger.debug("Contribution from path %s: %s (error %s)",
+                                         integrand["path"], energy, error)
+                        yield (integrand["path"], float(energy), float(error))
+                    batch = []
+        else:
+            for path in paths:
+                integrand = self.__walk(path) # obtain functions and breaking points
+                (energy, error) = self.__integrate(integrand)
+                if debug:
+                    logger.debug("Contribution from path %s: %s (error %s)",
+                                 integrand["path"], energy, error)
+                yield (integrand["path"], energy, error)
+
+    def __integrate_prefix(self, paths):
+        """
+        This private method integrates the paths organised as a prefix tree.
+        Paths are generated in depth-first order, so consecutive paths share
+        prefixes. The product of street and junction factors on the fixed grid
+        of angles (split at breaking points of all junctions) is kept for
+        every junction of the current branch, so each extension costs one
+        multiplication. Paths whose error estimate is still too large are
+        walked and integrated between their own breaking points.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG) # skip formatting of paths
+        (panels, start, extend) = self.__grid_factors()
+
+        branch = [] # junctions of the current branch
+        states = [] # (product, length, rotation) for every junction of the branch
+        for path in paths:
+            # Keep the common prefix of the branch and the path
+            common = 0
+            while common < min(len(branch), len(path)) and branch[common] == path[common]:
+                common += 1
+            del branch[common:]
+            del states[common:]
+
+            source = self.__source[1] if path[0] == self.__source[0] else self.__source[0]
+            for node in path[common:]:
+                if not branch: # "apparent" source street
+                    states.append(start(source, node))
+                else:
+                    previous = branch[-2] if len(branch) > 1 else source
+                    states.append(extend(previous, branch[-1], node, states[-1]))
+                branch.append(node)
+
+            # Close the path with the "apparent" receiver street
+            receiver = self.__receiver[1] if path[-1] == self.__receiver[0] else self.__receiver[0]
+            previous = branch[-2] if len(branch) > 1 else source
+            (f, L, _) = extend(previous, branch[-1], receiver, states[-1], half=True)
+            if self.__height: # 3D
+                f = f/L
+            (energy, error) = quadrature.integrate(f.reshape(len(panels), -1), panels)
+            self.__count(f.size)
+            path = [source] + path + [receiver]
+            if error > TOLERANCE*abs(energy):
+                (energy, error) = self.__integrate_kronrod(self.__fill(path))
+            if debug:
+                logger.debug("Contribution from path %s: %s (error %s)",
+                             path, energy, error)
+            yield (path, float(energy), float(error))
+
+    def __get_panels(self, subdivisions):
+        """
+        This private method returns panels of the grid of angles shared by all
+        paths. The grid is split at breaking points of all junctions in both
+        rotations, so junction functions are smooth on every panel. It returns
+        None if the grid has more than GRID_MAX_PANELS panels, since then
+        every path is evaluated on more angles than on its own panels.
+        """
+        if subdivisions not in self.__panels:
+            breaking_points = set()
+            for junction in self.__junctions.values():
+                if junction.get("breaking_point") is not None:
+                    breaking_points.update([junction["breaking_point"],
+                                            np.pi/2-junction["breaking_point"]])
+            panels = quadrature.compute_panels(sorted(breaking_points), 0, np.pi/2,
+                                               subdivisions)
+            self.__panels[subdivisions] = panels if len(panels) <= GRID_MAX_PANELS else None
+        return self.__panels[subdivisions]
+
+    def __grid_factors(self):
+        """
+        This private method returns the fixed grid of panels and two functions
+        of memoised factors on its angles. The function start(source, node)
+        returns the state (product, length, rotation) of the "apparent" source
+        street and the function extend(previous, current, following, state)
+        extends the state with the junction and the following street. It
+        returns None if the shared grid has too many panels.
+        """
+        graph = self.__graph
+        lengths = graph.get_lengths()
+        widths = graph.get_widths()
+        alphas = graph.get_alphas()
+        betas = graph.get_betas()
+
+        panels = self.__get_panels(PREFIX_SUBDIVISIONS)
+        if panels is None:
+            return None
+        theta = quadrature.compute_points(panels).ravel()
+        angles = np.array([theta, np.pi/2-theta]) # angles of both rotations
+        cosines = np.cos(angles)
+        tangents = np.tan(angles)
+        prefactor = 2*self.__height/np.pi if self.__height else 1/np.pi
+
+        street_factors = {}
+        def street_factor(i, j, rotation, half=False):
+            # Factor of the street (i, j) and its contribution to the length
+            key = (i, j, rotation, half)
+            if key not in street_factors:
+                street = graph.get_street(i, j)
+                length = lengths[street]/2 if half else lengths[street]
+                A = (1-alphas[street])**(length/widths[street]*tangents[rotation]) # wall absorption
+                B = np.exp(-2*betas[street]*length/cosines[rotation]) # air absorption
+                street_factors[key] = (A*B/cosines[rotation], length/cosines[rotation])
+            return street_factors[key]
+
+        junction_factors = {}
+        def junction_factor(previous, current, following, rotation):
+            # Junction probability distribution function and the change of rotation
+            key = (previous, current, following, rotation)
+            if key not in junction_factors:
+                junction = self.__get_junction(previous, current, following)
+                (kernel, scale, ratio) = junction["kernel"]
+                junction_factors[key] = (transfer(kernel, scale, ratio, angles[rotation]),
+                                         junction["turn"])
+            return junction_factors[key]
+
+        def extend(previous, current, following, state, half=False):
+            (product, length, rotation) = state
+            (function, turn) = junction_factor(previous, current, following, rotation)
+            rotation = (rotation+turn)%2
+            (factor, street_length) = street_factor(current, following, rotation, half)
+            return (product*function*factor, length+street_length, rotation)
+
+        def start(source, node):
+            (factor, length) = street_factor(source, node, 0, half=True)
+            return (prefactor*factor, 1+length, 0)
+
+        return (panels, start, extend)
+
     def __integrate(self, integrand):
         """
         This private method integrates functions.
         """
-        path = integrand["path"]
+        if self.__integration == "quad":
+            return self.__integrate_quad(integrand)
+        return self.__integrate_kronrod(integrand)
+
+    def __integrate_quad(self, integrand):
+        """
+        This private method integrates functions angle by angle with the
+        adaptive quad routine.
+        """
         functions = integrand["functions"]
         rotations = integrand["rotations"]
         lengths = integrand["lengths"]
@@ -302,33 +979,181 @@ class Model(object):
             return L
 
         if not self.__height: # 2D
-            (energy, error) = integrate.quad(compose_f, 0, np.pi/2)
+            function = compose_f
         else: # 3D
-            integrand = lambda theta: compose_f(theta)/compose_L(theta)
-            (energy, error) = integrate.quad(integrand, 0, np.pi/2)
-        print("Contribution from path {0}: {1} (error {2})".format(
-            path, energy, error))
+            function = lambda theta: compose_f(theta)/compose_L(theta)
+        if self.__profiler is None:
+            return integrate.quad(function, 0, np.pi/2)
+        # Full output (without warnings) holds the number of evaluations
+        (energy, error, info) = integrate.quad(function, 0, np.pi/2, full_output=1)[:3]
+        self.__count(info["neval"])
         return (energy, error)
 
-    def solve_all(self, positions):
+    def __integrate_kronrod(self, integrand):
+        """
+        This private method integrates functions with the composite
+        Gauss-Kronrod rule. Street values are packed into arrays (one row per
+        street) and the integrand is evaluated on all angles at once. Panels
+        are split at the breaking points of junction functions.
+        """
+        rotations = np.array(integrand["rotations"])[:, None]
+        lengths = np.array(integrand["lengths"])[:, None]
+        widths = np.array(integrand["widths"])[:, None]
+        alphas = np.array(integrand["alphas"])[:, None]
+        betas = np.array(integrand["betas"])[:, None]
+
+        panels = quadrature.compute_panels(integrand["breaking_points"],
+                                           0, np.pi/2, SUBDIVISIONS)
+        theta = quadrature.compute_points(panels).ravel()
+        angles = np.where(rotations==1, np.pi/2-theta, theta) # angle rotation
+        cosines = np.cos(angles)
+        A = (1-alphas)**(lengths/widths*np.tan(angles)) # wall absorption
+        B = np.exp(-2*betas*lengths/cosines) # air absorption
+        f = np.prod(A*B/cosines, axis=0)
+        f *= 2*self.__height/np.pi if self.__height else 1/np.pi
+        if integrand["kernels"]: # Junction probability distribution functions
+            (kernels, scales, ratios) = np.array(integrand["kernels"]).T[:, :, None]
+            f *= np.prod(transfer(kernels, scales, ratios, angles[:len(kernels)]), axis=0)
+        if self.__height: # 3D
+            f /= 1 + np.sum(lengths/cosines, axis=0)
+
+        (energy, error) = quadrature.integrate(f.reshape(len(panels), -1), panels)
+        self.__count(len(theta))
+        return (float(energy), float(error))
+
+    def __integrate_batch(self, integrands):
+        """
+        This private method integrates a batch of paths in one array operation
+        on a shared grid of angles. Paths whose error estimate is too large are
+        refined on finer grids and, if still inaccurate, integrated one by one
+        with panels split at their breaking points. It returns arrays of
+        energies, error estimates and numbers of integrand evaluations.
+        """
+        energies = np.zeros(len(integrands))
+        errors = np.zeros(len(integrands))
+        evaluations = np.zeros(len(integrands), dtype=int)
+        pending = np.arange(len(integrands))
+        subdivisions = BATCH_SUBDIVISIONS
+        for refinement in range(BATCH_REFINEMENTS+1):
+            (energies[pending], errors[pending]) = self.__integrate_stack(
+                [integrands[i] for i in pending], subdivisions)
+            evaluations[pending] += subdivisions*quadrature.PANEL_POINTS
+            pending = pending[errors[pending] > TOLERANCE*np.abs(energies[pending])]
+            if len(pending) == 0:
+                return (energies, errors, evaluations)
+            subdivisions *= 2
+        for i in pending:
+            (energies[i], errors[i]) = self.__integrate_kronrod(integrands[i])
+            if self.__profiler is not None: # counted per path of the batch
+                evaluations[i] += self.__profiler.take()
+        return (energies, errors, evaluations)
+
+    def __integrate_stack(self, integrands, subdivisions):
+        """
+        This private method stacks street values of paths into 2-D arrays
+        (paths by streets) padded with neutral streets and integrates all
+        paths on the grid of equal panels. It returns arrays of energies and
+        error estimates.
+        """
+        count = len(integrands)
+        streets = max(len(integrand["lengths"]) for integrand in integrands)
+        rotations = np.zeros((count, streets), dtype=int)
+        lengths = np.zeros((count, streets))
+        widths = np.ones((count, streets))
+        alphas = np.zeros((count, streets))
+        betas = np.zeros((count, streets))
+        mask = np.zeros((count, streets), dtype=bool) # False for padding
+        for (p, integrand) in enumerate(integrands):
+            n = len(integrand["lengths"])
+            rotations[p, :n] = integrand["rotations"]
+            lengths[p, :n] = integrand["lengths"]
+            widths[p, :n] = integrand["widths"]
+            alphas[p, :n] = integrand["alphas"]
+            betas[p, :n] = integrand["betas"]
+            mask[p, :n] = True
+
+        panels = quadrature.compute_panels([], 0, np.pi/2, subdivisions)
+        theta = quadrature.compute_points(panels).ravel()
+        angles = np.where(rotations[:, :, None]==1, np.pi/2-theta, theta) # angle rotation
+        cosines = np.cos(angles)
+        lengths = lengths[:, :, None]
+        A = (1-alphas[:, :, None])**(lengths/widths[:, :, None]*np.tan(angles)) # wall absorption
+        B = np.exp(-2*betas[:, :, None]*lengths/cosines) # air absorption
+        f = np.prod(np.where(mask[:, :, None], A*B/cosines, 1), axis=1)
+        f *= 2*self.__height/np.pi if self.__height else 1/np.pi
+        # Junction probability distribution functions (padded with constant 1)
+        junctions = max(len(integrand["kernels"]) for integrand in integrands)
+        kernels = np.zeros((count, junctions, 3))
+        kernels[:, :, 1] = 1
+        for (p, integrand) in enumerate(integrands):
+            kernels[p, :len(integrand["kernels"])] = integrand["kernels"]
+        (kernels, scales, ratios) = kernels.transpose(2, 0, 1)[:, :, :, None]
+        f *= np.prod(transfer(kernels, scales, ratios, angles[:, :junctions]), axis=1)
+        if self.__height: # 3D
+            f /= 1 + np.sum(lengths/cosines, axis=1)
+
+        return quadrature.integrate(f.reshape(count, len(panels), -1), panels)
+
+    def solve_all(self, positions, processes=1):
         """
         This method performs computations of the wave propagation problem from
         the source to all possible receivers and returns the result as X and Y
         coordinates of the receivers along with the percentage of the power
-        flow.
+        flow. If processes is greater than 1, batches of receivers are solved
+        by a pool of processes, each of which receives the network only once
+        (the "source" engine always runs in a single process). Solutions of
+        receivers are not tracked.
         """
+        try:
+            processes = int(processes)
+        except ValueError:
+            raise ValueError("Number of processes must be an integer.")
+        if processes < 1:
+            raise ValueError("Number of processes must be a positive number.")
         receivers = self.__get_receivers()
-        powers = []
-        for receiver in receivers:
-            self.set_receiver(*receiver) # * unpacks tuple
-            powers.append(self.solve())
+        started = time.perf_counter()
+        monitor = self.__monitor
+        if monitor is not None:
+            monitor.receivers_counted(len(receivers))
+        powers = {}
+        def report(batch, results):
+            # Store (result, elapsed) of receivers of the batch and report them
+            for (receiver, (result, elapsed)) in zip(batch, results):
+                powers[receiver] = result
+                if monitor is not None:
+                    monitor.receiver_solved(receiver, result, elapsed,
+                                            len(powers), len(receivers))
+
+        try:
+            if self.__engine in ("source", "transfer"):
+                solve = (self.__solve_source if self.__engine == "source"
+                         else self.__solve_transfer)
+                report(receivers, [(result, None) for result in solve(receivers)])
+            elif processes == 1:
+                # Solutions of receivers are not tracked (as in workers)
+                (tracking, self.__tracking) = (self.__tracking, False)
+                try:
+                    for receiver in receivers:
+                        report([receiver], solve_receivers([receiver], self))
+                        if monitor is not None:
+                            monitor.check(dict(powers))
+                finally:
+                    self.__tracking = tracking
+            else:
+                self.__solve_parallel(receivers, processes, report)
+            if monitor is not None:
+                monitor.check(dict(powers))
+        except Cancelled:
+            raise Cancelled(dict(powers))
+        logger.info("Solved %d receivers from node %s in %.3f s", len(receivers),
+                    self.__source, time.perf_counter() - started)
 
         receiver_positions = self.__get_positions(receivers, positions)
         source_position = self.__get_positions([self.__source], positions)
 
         X = [element[0] for element in receiver_positions]
         Y = [element[1] for element in receiver_positions]
-        Z = [element[0] for element in powers]
+        Z = [powers[receiver][0] for receiver in receivers]
 
         X.append(source_position[0][0])
         Y.append(source_position[0][1])
@@ -336,16 +1161,359 @@ class Model(object):
 
         return (X, Y, Z)
 
+    def __solve_parallel(self, receivers, processes, report):
+        """
+        This private method solves batches of receivers by a pool of processes
+        and reports every batch as soon as it is finished. The cancellation of
+        the monitor is passed to the workers by the shared event, so that they
+        stop between paths, and pending batches are dropped.
+        """
+        monitor = self.__monitor
+        size = max(1, -(-len(receivers)//(RECEIVER_BATCHES*processes)))
+        batches = [receivers[i:i+size] for i in range(0, len(receivers), size)]
+        # Workers are spawned, since forking from a thread (of the GUI) is unsafe
+        context = multiprocessing.get_context("spawn")
+        cancelled = context.Event()
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                       initializer=initialize_worker,
+                                       initargs=(self, cancelled))
+        try:
+            pending = {executor.submit(solve_receivers, batch): batch
+                       for batch in batches}
+            while pending:
+                (done, _) = wait(pending, timeout=CANCELLATION_INTERVAL,
+                                 return_when=FIRST_COMPLETED)
+                for future in done:
+                    report(pending.pop(future), future.result())
+                if monitor is not None and monitor.get_token().is_cancelled():
+                    break
+        finally:
+            # Stop running batches (cancelled or failed) and drop pending ones
+            cancelled.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __solve_source(self, receivers):
+        """
+        This private method solves the problem for all receivers with a single
+        depth-first traversal from the source junctions. As in solve, the
+        cutoff of the receiver street (i, j) is min(ds(i), ds(j)) + threshold,
+        where ds is the distance from the nearest source junction, and a walk
+        of k streets ending at i or j contributes to the receiver only if k
+        does not exceed the cutoff. The walk is extended to a junction only if
+        some receiver can still be reached from it within its cutoff. Walks are
+        closed on the shared grid of angles split at breaking points of all
+        junctions, as in the prefix integration, and only walks whose error
+        estimate is still too large (smooth but steep integrands of long
+        walks) fall back to the Gauss-Kronrod rule on their own panels. If the
+        shared grid has too many panels, all walks are integrated on their own
+        panels. The numbers of walks and fallbacks are logged. The method
+        returns the list of (power, error, count) tuples of receivers.
+        """
+        debug = logger.isEnabledFor(logging.DEBUG) # skip formatting of paths
+        assert self.__source is not None and self.__threshold is not None
+        graph = self.__graph
+        indptr = graph.get_indptr().tolist()
+        indices = graph.get_indices().tolist()
+        edge_streets = graph.get_edge_streets().tolist()
+        (cutoffs, bounds) = self.__get_cutoffs()
+        (cutoffs, bounds) = (cutoffs.tolist(), bounds.tolist())
+
+        factors = self.__grid_factors()
+        if factors is None: # walks are integrated on their own panels
+            panels = None
+            start = lambda source, node: None
+            def extend(previous, current, following, state, half=False):
+                self.__get_junction(previous, current, following) # implemented
+        else:
+            (panels, start, extend) = factors
+        street_powers = np.zeros(graph.get_streets())
+        street_errors = np.zeros(graph.get_streets())
+        street_counts = np.zeros(graph.get_streets(), dtype=np.int64)
+        fallbacks = [0] # walks integrated on their own panels
+
+        def close(source, branch, states):
+            # Add contributions of the walk to receivers at its last junction,
+            # all receivers of the junction are integrated at once
+            node = branch[-1]
+            previous = branch[-2] if len(branch) > 1 else source
+            closing = [edge for edge in range(indptr[node], indptr[node+1])
+                       if len(branch)-1 <= cutoffs[edge_streets[edge]]]
+            if not closing:
+                return
+            if panels is None:
+                (energies, errors) = ([None]*len(closing), [None]*len(closing))
+            else:
+                values = []
+                for edge in closing:
+                    (f, L, _) = extend(previous, node, indices[edge], states[-1], half=True)
+                    values.append(f/L if self.__height else f) # 3D or 2D
+                (energies, errors) = quadrature.integrate(
+                    np.reshape(values, (len(closing), len(panels), -1)), panels)
+            for (edge, energy, error) in zip(closing, energies, errors):
+                path = [source] + branch + [indices[edge]]
+                if energy is None or error > TOLERANCE*abs(energy):
+                    (energy, error) = self.__integrate_kronrod(self.__fill(path))
+                    fallbacks[0] += 1
+                if debug:
+                    logger.debug("Contribution from path %s: %s (error %s)",
+                                 path, energy, error)
+                street = edge_streets[edge]
+                street_powers[street] += energy
+                street_errors[street] += error
+                street_counts[street] += 1
+
+        for root in self.__source:
+            source = self.__source[1] if root == self.__source[0] else self.__source[0]
+            if bounds[root] < 0:
+                continue
+            branch = [root]
+            states = [start(source, root)]
+            edges = [indptr[root]] # next edge to explore at each depth
+            close(source, branch, states)
+            while edges:
+                edge = edges[-1]
+                if edge == indptr[branch[-1]+1]: # all neighbours explored
+                    branch.pop()
+                    states.pop()
+                    edges.pop()
+                    continue
+                edges[-1] = edge + 1
+                neighbor = indices[edge]
+                # Prune before descending (len(branch) is the depth of the neighbor)
+                if len(branch) > bounds[neighbor]:
+                    continue
+                previous = branch[-2] if len(branch) > 1 else source
+                states.append(extend(previous, branch[-1], neighbor, states[-1]))
+                branch.append(neighbor)
+                edges.append(indptr[neighbor])
+                close(source, branch, states)
+                if self.__monitor is not None:
+                    self.__monitor.check()
+        logger.info("Integrated %d walks from node %s (%d on their own panels)",
+                    int(street_counts.sum()), self.__source, fallbacks[0])
+
+        results = []
+        for receiver in receivers:
+            street = graph.get_street(*receiver)
+            logger.info("Resulting power from node %s to node %s is %s (error %s)",
+                        self.__source, receiver, street_powers[street], street_errors[street])
+            results.append((float(street_powers[street]), float(street_errors[street]),
+                            int(street_counts[street])))
+        return results
+
+    def __solve_transfer(self, receivers):
+        """
+        This private method solves the problem for all receivers by propagating
+        energy on the fixed grid of angles. The state (edge, rotation) holds the
+        sum of integrands of all walks of k streets which end with the directed
+        edge in the given rotation. A step multiplies the states with junction
+        and street factors of all transitions between edges, while closing
+        transitions add the states to receiver streets within their cutoffs.
+        Panels of the grid are split at all breaking points of the network, so
+        that the summed integrands are smooth on every panel (if the grid has
+        too many panels, the "source" engine is used instead). The method is
+        only implemented in 2D, since the 3D integrand is divided by the length
+        of the whole path, which is not a product of street factors.
+        """
+        assert self.__source is not None and self.__threshold is not None
+        if self.__height:
+            raise ValueError("Transfer engine is only implemented in 2D.")
+        graph = self.__graph
+        indptr = graph.get_indptr().tolist()
+        indices = graph.get_indices().tolist()
+        edge_streets = graph.get_edge_streets()
+        streets = graph.get_streets()
+        states_count = 2*len(indices) # state of edge e in rotation r is 2*e+r
+        (cutoffs, bounds) = self.__get_cutoffs()
+
+        panels = self.__get_panels(TRANSFER_SUBDIVISIONS)
+        if panels is None: # too many panels, walks are integrated one by one
+            return self.__solve_source(receivers)
+        theta = quadrature.compute_points(panels).ravel()
+        angles = np.array([theta, np.pi/2-theta]) # angles of both rotations
+
+        # Street factors of full and half streets (street, rotation, angle)
+        lengths = graph.get_lengths()[:, None, None]
+        widths = graph.get_widths()[:, None, None]
+        alphas = graph.get_alphas()[:, None, None]
+        betas = graph.get_betas()[:, None, None]
+        cosines = np.cos(angles)
+        factors = []
+        for length in [lengths, lengths/2]:
+            A = (1-alphas)**(length/widths*np.tan(angles)) # wall absorption
+            B = np.exp(-2*betas*length/cosines) # air absorption
+            factors.append((A*B/cosines).reshape(2*streets, -1))
+        (full_factors, half_factors) = factors
+
+        # Transitions (state, junction function, following state) and
+        # junctions which are not implemented (state, following edge, message)
+        functions = {} # row of every (kernel, scale, ratio, rotation)
+        rows = []
+        transitions = []
+        invalid = []
+        for current in range(self.__nodes):
+            for edge in range(indptr[current], indptr[current+1]):
+                previous = indices[edge]
+                incoming = graph.get_edge(previous, current)
+                for following_edge in range(indptr[current], indptr[current+1]):
+                    junction = self.__junctions[(previous, current, indices[following_edge])]
+                    for rotation in [0, 1]:
+                        if "error" in junction:
+                            invalid.append((2*incoming+rotation, following_edge,
+                                            junction["error"]))
+                            continue
+                        key = junction["kernel"] + (rotation,)
+                        if key not in functions:
+                            functions[key] = len(rows)
+                            rows.append(transfer(*junction["kernel"], angles[rotation]))
+                        transitions.append((2*incoming+rotation, functions[key],
+                                            2*following_edge+(rotation+junction["turn"])%2))
+        rows = np.array(rows).reshape(-1, len(theta))
+        transitions = np.array(transitions, dtype=np.int64).reshape(-1, 3)
+        transitions = transitions[np.argsort(transitions[:, 2], kind="stable")]
+        (sources, functions, targets) = transitions.T
+
+        # Blocks of transitions sorted by the following state
+        blocks = []
+        for first in range(0, len(transitions), TRANSFER_BLOCK):
+            block = slice(first, first+TRANSFER_BLOCK)
+            (unique, starts) = np.unique(targets[block], return_index=True)
+            blocks.append((block, unique, starts))
+
+        # Street factors of states and the matrix summing states of streets
+        state_streets = np.repeat(edge_streets, 2)
+        full_factors = full_factors[2*state_streets + np.arange(states_count)%2]
+        half_factors = half_factors[2*state_streets + np.arange(states_count)%2]
+        summation = sparse.csr_matrix(
+            (np.ones(states_count), (state_streets, np.arange(states_count))),
+            shape=(streets, states_count))
+
+        # Initial states of both "apparent" source streets (walks of 0 streets)
+        states = np.zeros((states_count, len(theta)))
+        counts = np.zeros(states_count)
+        prefactor = 1/np.pi
+        for root in self.__source:
+            source = self.__source[1] if root == self.__source[0] else self.__source[0]
+            if bounds[root] >= 0:
+                edge = graph.get_edge(source, root)
+                states[2*edge] = prefactor*half_factors[2*edge]
+                counts[2*edge] = 1
+
+        values = np.zeros((streets, len(theta))) # summed integrands of receivers
+        street_counts = np.zeros(streets)
+        heads = np.repeat(indices, 2) # last junction of states
+        for step in range(max(cutoffs.max(), -1)+1):
+            if self.__monitor is not None:
+                self.__monitor.check()
+            # Discard states from which no receiver is reached within its cutoff
+            discarded = bounds[heads] < step
+            states[discarded] = 0
+            counts[discarded] = 0
+            for (state, following_edge, message) in invalid:
+                if counts[state] and (step+1 <= bounds[indices[following_edge]] or
+                                      step <= cutoffs[edge_streets[following_edge]]):
+                    raise ValueError(message)
+
+            # Multiply states with junction functions of transitions
+            following = np.zeros((states_count, len(theta)))
+            following_counts = np.zeros(states_count)
+            for (block, unique, starts) in blocks:
+                products = states[sources[block]]*rows[functions[block]]
+                following[unique] += np.add.reduceat(products, starts, axis=0)
+                following_counts[unique] += np.add.reduceat(counts[sources[block]], starts)
+
+            # Close walks with the "apparent" receiver streets
+            reached = cutoffs >= step
+            values[reached] += (summation @ (following*half_factors))[reached]
+            street_counts[reached] += (summation @ following_counts)[reached]
+
+            # Extend walks by the following streets
+            states = following*full_factors
+            counts = following_counts
+
+        (energies, errors) = quadrature.integrate(
+            values.reshape(streets, len(panels), -1), panels)
+        results = []
+        for receiver in receivers:
+            street = graph.get_street(*receiver)
+            logger.info("Resulting power from node %s to node %s is %s (error %s)",
+                        self.__source, receiver, energies[street], errors[street])
+            results.append((float(energies[street]), float(errors[street]),
+                            int(street_counts[street])))
+        return results
+
+    def __get_cutoffs(self):
+        """
+        This private method returns the array of cutoffs of receiver streets
+        (-1 for the source street and streets which are not reachable) and the
+        array of bounds of junctions, which is the maximal number of streets
+        of a walk from the source to the junction that can still be extended
+        to some receiver within its cutoff.
+        """
+        graph = self.__graph
+        indptr = graph.get_indptr()
+        indices = graph.get_indices().tolist()
+        edge_streets = graph.get_edge_streets()
+        ends = graph.get_ends()
+
+        # Cutoffs of receiver streets (-1 for the source street and unreachable streets)
+        distances = np.minimum(self.__get_distances(self.__source[0]),
+                               self.__get_distances(self.__source[1]))
+        cutoffs = np.minimum(distances[ends[:, 0]], distances[ends[:, 1]]) + self.__threshold
+        cutoffs[distances[ends[:, 0]] == UNREACHABLE] = -1
+        cutoffs[graph.get_street(*self.__source)] = -1
+
+        # Maximal depth of walks through every junction, bounds[u] = max over
+        # junctions v of (largest cutoff of streets at v) - distance(u, v)
+        bounds = np.full(self.__nodes, -1, dtype=np.int64)
+        np.maximum.at(bounds, np.repeat(np.arange(self.__nodes), np.diff(indptr)),
+                      cutoffs[edge_streets])
+        bounds = bounds.tolist()
+        heap = [(-bound, node) for (node, bound) in enumerate(bounds) if bound > 0]
+        heapq.heapify(heap)
+        while heap:
+            (bound, node) = heapq.heappop(heap)
+            if -bound < bounds[node]:
+                continue
+            for neighbor in indices[indptr[node]:indptr[node+1]]:
+                if bounds[neighbor] < -bound-1:
+                    bounds[neighbor] = -bound-1
+                    heapq.heappush(heap, (bound+1, neighbor))
+        return (cutoffs, np.array(bounds))
+
+
+    def __getstate__(self):
+        """
+        This method excludes the junction table (which holds functions), cached
+        distances, tracked solutions and the monitor from the pickled
+        state of the model. Tracking is disabled in the pickled state, so
+        models of worker processes do not keep solutions of receivers.
+        """
+        state = self.__dict__.copy()
+        state["_Model__junctions"] = None
+        state["_Model__distances"] = OrderedDict()
+        state["_Model__tracking"] = False
+        state["_Model__tracked"] = OrderedDict()
+        state["_Model__monitor"] = None
+        return state
+
+    def __setstate__(self, state):
+        """
+        This method restores the pickled state and rebuilds the junction table.
+        """
+        self.__dict__.update(state)
+        if self.__graph is not None:
+            self.__set_junctions()
+
     def __get_receivers(self):
         """
         This private method returns a list of tuples of all possible receivers.
         """
+        ends = self.__graph.get_ends()
         receivers = []
-        for j in range(len(self.__modified_adjacency)):
-            for i in range(j):
-                if self.__modified_adjacency[i][j] != 0:
-                    if self.__source != (i,j) and self.__source != (j,i):
-                        receivers.append((i,j))
+        for (i, j) in ends[np.lexsort((ends[:, 0], ends[:, 1]))].tolist():
+            if self.__source != (i,j) and self.__source != (j,i):
+                receivers.append((i,j))
         return receivers
 
     def __get_positions(self, streets, positions):
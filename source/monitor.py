@@ -0,0 +1,155 @@
+"""
+This module implements monitors of computations of the model. A monitor
+receives structured reports of the progress (enumeration of paths,
+integration of paths and solved receivers) and holds the cancellation token,
+which the model checks between units of work.
+"""
+
+import threading
+import time
+
+class Cancelled(Exception):
+    """
+    This exception is raised by the model when the computation is cancelled.
+    The partial attribute holds the results computed so far: (power, error,
+    count) of the paths integrated by solve or the dictionary of results of
+    receivers solved by solve_all.
+    """
+    def __init__(self, partial=None):
+        super(Cancelled, self).__init__("Computation cancelled.")
+        self.partial = partial
+
+class CancellationToken(object):
+    """
+    This class of methods implements the thread-safe cancellation token. The
+    token may wrap the given event (e.g. multiprocessing.Event shared with
+    worker processes).
+    """
+    def __init__(self, event=None):
+        self.__event = threading.Event() if event is None else event
+
+    def cancel(self):
+        """
+        This method requests cancellation of the computation.
+        """
+        self.__event.set()
+
+    def reset(self):
+        """
+        This method withdraws the request for cancellation.
+        """
+        self.__event.clear()
+
+    def is_cancelled(self):
+        """
+        This method returns True if cancellation was requested.
+        """
+        return self.__event.is_set()
+
+class Monitor(object):
+    """
+    This class of methods is the base of monitors. Hooks do nothing and may
+    be overridden by subclasses. Hooks are called from the thread of the
+    computation. If count_paths is True, solve enumerates paths once more in
+    advance to report their total number.
+    """
+    def __init__(self, token=None, count_paths=False):
+        self.__token = CancellationToken() if token is None else token
+        self.__count_paths = count_paths
+
+    def get_token(self):
+        """
+        This getter method returns the cancellation token.
+        """
+        return self.__token
+
+    def counts_paths(self):
+        """
+        This method returns True if paths are counted in advance.
+        """
+        return self.__count_paths
+
+    def check(self, partial=None):
+        """
+        This method raises Cancelled with the partial results if cancellation
+        was requested.
+        """
+        if self.__token.is_cancelled():
+            raise Cancelled(partial)
+
+    def paths_counted(self, total):
+        """
+        This hook is called before paths between the source and the receiver
+        are integrated with the total number of paths (None unless paths are
+        counted in advance).
+        """
+
+    def path_integrated(self, path, energy, error, done, total):
+        """
+        This hook is called after every integrated path with its contribution
+        and the number of integrated paths.
+        """
+
+    def receivers_counted(self, total):
+        """
+        This hook is called once solve_all finds all receivers with their
+        total number.
+        """
+
+    def receiver_solved(self, receiver, result, elapsed, done, total):
+        """
+        This hook is called after every receiver of solve_all with its result
+        (power, error, count), the time of the computation in seconds (None if
+        receivers are solved jointly) and the number of solved receivers.
+        """
+
+class ProgressMonitor(Monitor):
+    """
+    This class of methods stores the latest progress of every stage ("paths"
+    and "receivers") and estimates the remaining time.
+    """
+    def __init__(self, token=None, count_paths=False):
+        super(ProgressMonitor, self).__init__(token, count_paths)
+        self.__progress = {}
+        self.__started = {}
+
+    def paths_counted(self, total):
+        self.__update("paths", 0, total)
+
+    def path_integrated(self, path, energy, error, done, total):
+        self.__update("paths", done, total)
+
+    def receivers_counted(self, total):
+        self.__update("receivers", 0, total)
+
+    def receiver_solved(self, receiver, result, elapsed, done, total):
+        self.__update("receivers", done, total)
+
+    def __update(self, stage, done, total):
+        """
+        This private method stores the progress of the stage and restarts its
+        clock whenever the stage starts again.
+        """
+        if done == 0 or stage not in self.__started:
+            self.__started[stage] = time.monotonic()
+        self.__progress[stage] = (done, total)
+
+    def get_progress(self):
+        """
+        This getter method returns the dictionary of (done, total) pairs of
+        stages.
+        """
+        return dict(self.__progress)
+
+    def get_eta(self, stage):
+        """
+        This method returns the estimated remaining time of the stage in
+        seconds (extrapolated linearly) or None if it cannot be estimated.
+        """
+        if stage not in self.__progress:
+            return None
+        (done, total) = self.__progress[stage]
+        if not done or total is None:
+            return None
+        elapsed = time.monotonic() - self.__started[stage]
+        return elapsed*(total-done)/done
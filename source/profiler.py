@@ -0,0 +1,103 @@
+"""
+This module implements the profiler of stages of the model. Every stage
+records the wall time, the number of calls, the net number of allocated
+memory blocks and the net number of traced bytes (if tracemalloc is tracing).
+Stages may be nested and time of nested stages is excluded from the outer
+stage. The profiler also records the number of integrand evaluations of
+every path.
+"""
+
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class Profiler(object):
+    """
+    This class of methods collects measurements of stages and evaluations.
+    """
+    def __init__(self):
+        self.__stages = OrderedDict()
+        self.__active = [] # stack of running stages
+        self.__mark = None # (time, blocks, bytes) when the top stage resumed
+        self.__pending = 0 # evaluations of the current path
+        self.__evaluations = []
+
+    def __measure(self):
+        """
+        This private method returns the current (time, blocks, bytes).
+        """
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        return (time.perf_counter(), sys.getallocatedblocks(), traced)
+
+    def __charge(self):
+        """
+        This private method charges the measurements since the last mark to
+        the running stage and sets the new mark.
+        """
+        mark = self.__measure()
+        if self.__active:
+            stage = self.__stages[self.__active[-1]]
+            stage["seconds"] += mark[0] - self.__mark[0]
+            stage["blocks"] += mark[1] - self.__mark[1]
+            stage["bytes"] += mark[2] - self.__mark[2]
+        self.__mark = mark
+
+    @contextmanager
+    def stage(self, name):
+        """
+        This context manager measures the stage (excluding nested stages).
+        """
+        if name not in self.__stages:
+            self.__stages[name] = {"seconds": 0.0, "calls": 0, "blocks": 0, "bytes": 0}
+        self.__stages[name]["calls"] += 1
+        self.__charge()
+        self.__active.append(name)
+        try:
+            yield
+        finally:
+            self.__charge()
+            self.__active.pop()
+
+    def iterate(self, name, iterator):
+        """
+        This method generates the items of the iterator and measures every
+        step of the iterator as a call of the stage.
+        """
+        iterator = iter(iterator)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, evaluations):
+        """
+        This method adds integrand evaluations to the current path.
+        """
+        self.__pending += int(evaluations)
+
+    def take(self):
+        """
+        This method returns and resets the evaluations of the current path.
+        """
+        (evaluations, self.__pending) = (self.__pending, 0)
+        return evaluations
+
+    def finish_path(self):
+        """
+        This method records the evaluations of the current path.
+        """
+        self.__evaluations.append(self.take())
+
+    def get_report(self):
+        """
+        This method returns the report: the dictionary of stages (seconds,
+        calls, blocks and bytes of every stage) and the list of evaluations
+        of paths.
+        """
+        return {"stages": {name: dict(stage) for (name, stage) in self.__stages.items()},
+                "evaluations": list(self.__evaluations)}
@@ -0,0 +1,95 @@
+"""
+This module implements the composite Gauss-Kronrod quadrature which evaluates
+integrands on whole arrays of angles at once instead of one angle at a time.
+"""
+
+import numpy as np
+
+# Nodes of the 15-point Kronrod rule on [-1, 1] (QUADPACK qk15)
+KRONROD_NODES = np.array([
+    -0.991455371120812639206854697526329,
+    -0.949107912342758524526189684047851,
+    -0.864864423359769072789712788640926,
+    -0.741531185599394439863864773280788,
+    -0.586087235467691130294144845693013,
+    -0.405845151377397166906606412076961,
+    -0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+    0.207784955007898467600689403773245,
+    0.405845151377397166906606412076961,
+    0.586087235467691130294144845693013,
+    0.741531185599394439863864773280788,
+    0.864864423359769072789712788640926,
+    0.949107912342758524526189684047851,
+    0.991455371120812639206854697526329])
+
+# Weights of the 15-point Kronrod rule
+KRONROD_WEIGHTS = np.array([
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+    0.204432940075298892414161999234649,
+    0.190350578064785409913256402421014,
+    0.169004726639267902826583426598550,
+    0.140653259715525918745189590510238,
+    0.104790010322250183839876322541518,
+    0.063092092629978553290700663189204,
+    0.022935322010529224963732008058970])
+
+# Weights of the embedded 7-point Gauss rule (zero at Kronrod-only nodes)
+GAUSS_WEIGHTS = np.array([
+    0.0,
+    0.129484966168869693270611432679082,
+    0.0,
+    0.279705391489276667901467771423780,
+    0.0,
+    0.381830050505118944950369775488975,
+    0.0,
+    0.417959183673469387755102040816327,
+    0.0,
+    0.381830050505118944950369775488975,
+    0.0,
+    0.279705391489276667901467771423780,
+    0.0,
+    0.129484966168869693270611432679082,
+    0.0])
+
+# Number of points of every panel
+PANEL_POINTS = len(KRONROD_NODES)
+
+def compute_panels(breaking_points, a, b, subdivisions=1):
+    """
+    This function returns the (panels, 2) array of panel ends, obtained by
+    splitting the interval [a, b] at the breaking points and by splitting
+    every part into the given number of equal subdivisions.
+    """
+    ends = np.unique(np.clip(np.concatenate(([a, b], breaking_points)), a, b))
+    ends = np.concatenate([np.linspace(start, end, subdivisions+1)[:-1]
+                           for (start, end) in zip(ends[:-1], ends[1:])] + [[b]])
+    return np.stack((ends[:-1], ends[1:]), axis=1)
+
+def compute_points(panels):
+    """
+    This function returns the (panels, PANEL_POINTS) array of quadrature
+    points of the given panels.
+    """
+    centres = (panels[:, 0] + panels[:, 1])/2
+    halves = (panels[:, 1] - panels[:, 0])/2
+    return centres[:, None] + halves[:, None]*KRONROD_NODES
+
+def integrate(values, panels):
+    """
+    This function integrates the values of (..., panels, PANEL_POINTS) shape
+    evaluated at the quadrature points of the panels. It returns the Kronrod
+    estimate of the integral and the error estimate, which is the sum of
+    absolute differences between the Kronrod and Gauss estimates of panels.
+    """
+    halves = (panels[:, 1] - panels[:, 0])/2
+    kronrod = np.sum(values*KRONROD_WEIGHTS, axis=-1)*halves
+    gauss = np.sum(values*GAUSS_WEIGHTS, axis=-1)*halves
+    return (np.sum(kronrod, axis=-1), np.sum(np.abs(kronrod - gauss), axis=-1))
@@ -0,0 +1,377 @@
+"""
+This module implements the binary format of networks. A network is stored as
+an uncompressed NumPy archive (.npz) of positions of junctions, junctions of
+streets and arrays of street values (length, width, alpha, beta and
+orientation), so the size of the file is proportional to the number of
+streets. Arrays of the archive are memory-mapped when the network is loaded.
+The module also converts networks from and to the JSON format of
+Constructor.export_network, which is read as a stream (row by row) without
+building the dense matrices.
+
+Usage:
+    python -m source.storage network.json network.npz
+    python -m source.storage network.npz network.json
+"""
+
+import argparse
+import json
+import re
+import struct
+import sys
+import zipfile
+
+import numpy as np
+
+from source.graph import Graph
+
+# Version of the binary format
+FORMAT_VERSION = 1
+
+# Scalar values of networks
+SCALARS = ["horizontals", "verticals", "nodes", "stage"]
+
+# Arrays of street values of modified networks
+STREETS = ["lengths", "widths", "alphas", "betas", "orientations"]
+
+# Size of the fixed part of the local file header of zip archives
+LOCAL_HEADER_SIZE = 30
+
+# Number of characters read from JSON files at once
+CHUNK_SIZE = 1 << 20
+
+# Streets (dictionaries) in rows of the modified adjacency matrix
+STREET_PATTERN = re.compile(r"\{[^{}]*\}")
+
+def save_network(filename, network):
+    """
+    This function saves the network (the dictionary of scalars, positions,
+    ends and arrays of street values of modified networks) to the binary
+    file.
+    """
+    arrays = {"version": np.int64(FORMAT_VERSION),
+              "positions": np.asarray(network["positions"], dtype=float).reshape(-1, 2),
+              "ends": np.asarray(network["ends"], dtype=np.int64).reshape(-1, 2)}
+    for key in SCALARS:
+        if network[key] is None:
+            raise ValueError("Network is not constructed.")
+        arrays[key] = np.int64(network[key])
+    if "widths" in network:
+        for key in STREETS:
+            arrays[key] = np.asarray(network[key],
+                                     dtype=np.int64 if key == "orientations" else float)
+    with open(filename, "wb") as file: # keep the extension of the file name
+        np.savez(file, **arrays)
+
+def load_network(filename, mmap=True):
+    """
+    This function loads the network from the binary file. Arrays are
+    memory-mapped (read-only) unless mmap is False.
+    """
+    arrays = load_arrays(filename, mmap)
+    if "version" not in arrays or int(arrays["version"]) > FORMAT_VERSION:
+        raise ValueError("Unsupported network file.")
+    network = {key: int(arrays[key]) for key in SCALARS}
+    network["positions"] = arrays["positions"]
+    network["ends"] = arrays["ends"]
+    if "widths" in arrays:
+        for key in STREETS:
+            network[key] = arrays[key]
+    return network
+
+def is_binary(filename):
+    """
+    This function returns True if the file is in the binary format (a zip
+    archive). The format is detected from the content, so files of any name
+    are read, and all other files are read as JSON.
+    """
+    return zipfile.is_zipfile(filename)
+
+def read_network(filename):
+    """
+    This function reads the network from the binary file (memory-mapped) or
+    from the JSON file (as a stream), depending on the content of the file.
+    """
+    if is_binary(filename):
+        return load_network(filename)
+    return read_json(filename)
+
+def load_arrays(filename, mmap=True):
+    """
+    This function returns the dictionary of arrays of the uncompressed
+    archive. Since np.load does not memory-map archives, every stored array
+    is memory-mapped at the offset of its data in the archive.
+    """
+    if not mmap:
+        with np.load(filename) as archive:
+            return {name: archive[name] for name in archive.files}
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as file:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("Compressed network files cannot be memory-mapped.")
+            file.seek(info.header_offset)
+            header = file.read(LOCAL_HEADER_SIZE)
+            (name_length, extra_length) = struct.unpack("<HH", header[26:30])
+            file.seek(info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                (shape, fortran, dtype) = np.lib.format.read_array_header_1_0(file)
+            else:
+                (shape, fortran, dtype) = np.lib.format.read_array_header_2_0(file)
+            if dtype.hasobject:
+                raise ValueError("Network files cannot hold objects.")
+            if len(shape) == 0 or np.prod(shape) == 0: # read scalars and empty arrays
+                data = file.read(int(np.prod(shape))*dtype.itemsize)
+                arrays[name] = np.frombuffer(data, dtype=dtype).reshape(shape)
+                continue
+            arrays[name] = np.memmap(filename, dtype=dtype, mode="r", offset=file.tell(),
+                                     shape=shape, order="F" if fortran else "C")
+    return arrays
+
+def from_json(invalues):
+    """
+    This function converts the dictionary of the JSON format to the network.
+    """
+    network = {key: invalues[key] for key in SCALARS}
+    network["positions"] = np.asarray(invalues["positions"], dtype=float).reshape(-1, 2)
+    if invalues["modified_adjacency"] is None:
+        adjacency = np.asarray(invalues["adjacency"])
+        network["ends"] = np.argwhere(np.triu(adjacency) != 0)
+        return network
+    graph = Graph.from_modified_adjacency(invalues["modified_adjacency"])
+    network["ends"] = graph.get_ends()
+    network["lengths"] = graph.get_lengths()
+    network["widths"] = graph.get_widths()
+    network["alphas"] = graph.get_alphas()
+    network["betas"] = graph.get_betas()
+    network["orientations"] = graph.get_street_orientations()
+    return network
+
+def to_json(network):
+    """
+    This function converts the network to the dictionary of the JSON format.
+    """
+    nodes = int(network["nodes"])
+    ends = np.asarray(network["ends"], dtype=np.int64).reshape(-1, 2)
+    adjacency = np.zeros((nodes, nodes), dtype=int)
+    adjacency[ends[:, 0], ends[:, 1]] = 1
+    adjacency[ends[:, 1], ends[:, 0]] = 1
+    if "widths" in network:
+        graph = Graph(nodes, ends, *[network[key] for key in STREETS])
+        modified_adjacency = graph.to_modified_adjacency()
+    else:
+        modified_adjacency = None
+    return {"horizontals": network["horizontals"],
+            "verticals": network["verticals"],
+            "nodes": nodes,
+            "adjacency": adjacency.tolist(),
+            "modified_adjacency": modified_adjacency,
+            "positions": np.asarray(network["positions"]).tolist(),
+            "stage": network["stage"]
+            }
+
+class JSONStream(object):
+    """
+    This class of methods reads the JSON file in chunks. Only the current
+    chunk (and the value being read) is kept in memory.
+    """
+    def __init__(self, file):
+        self.__file = file
+        self.__buffer = ""
+        self.__position = 0
+        self.__decoder = json.JSONDecoder()
+
+    def __extend(self):
+        """
+        This private method appends the next chunk to the unread part of the
+        buffer and returns False at the end of the file.
+        """
+        chunk = self.__file.read(CHUNK_SIZE)
+        self.__buffer = self.__buffer[self.__position:] + chunk
+        self.__position = 0
+        return chunk != ""
+
+    def peek(self):
+        """
+        This method skips whitespace and returns the next character (or ""
+        at the end of the file).
+        """
+        while True:
+            buffer = self.__buffer
+            while self.__position < len(buffer) and buffer[self.__position].isspace():
+                self.__position += 1
+            # The buffer is rebuilt by __extend (also at the end of the file)
+            if self.__position < len(buffer) or not self.__extend():
+                return self.__buffer[self.__position:self.__position+1]
+
+    def expect(self, character):
+        """
+        This method consumes the next character, which must be the given one.
+        """
+        if self.peek() != character:
+            raise ValueError("Invalid network file.")
+        self.__position += 1
+
+    def skip(self, character):
+        """
+        This method consumes the next character if it is the given one and
+        returns True if it was consumed.
+        """
+        if self.peek() == character:
+            self.__position += 1
+            return True
+        return False
+
+    def read_until(self, character):
+        """
+        This method returns the text up to the given character and consumes
+        the character.
+        """
+        while True:
+            end = self.__buffer.find(character, self.__position)
+            if end != -1:
+                text = self.__buffer[self.__position:end]
+                self.__position = end + 1
+                return text
+            if not self.__extend():
+                raise ValueError("Invalid network file.")
+
+    def read_value(self):
+        """
+        This method decodes the next (complete) JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                (value, end) = self.__decoder.raw_decode(self.__buffer, self.__position)
+            except json.JSONDecodeError:
+                value = None
+                end = None
+            # Values at the end of the buffer may continue in the next chunk
+            if end is not None and end < len(self.__buffer):
+                self.__position = end
+                return value
+            if not self.__extend():
+                if end is None:
+                    raise ValueError("Invalid network file.")
+                self.__position = end
+                return value
+
+    def read_rows(self):
+        """
+        This method generates the texts of rows of the matrix (the array of
+        arrays of numbers and objects).
+        """
+        self.expect("[")
+        if self.skip("]"):
+            return
+        while True:
+            self.expect("[")
+            yield self.read_until("]")
+            if not self.skip(","):
+                self.expect("]")
+                return
+
+def read_json(filename):
+    """
+    This function reads the network from the JSON file of
+    Constructor.export_network as a stream. Zero cells of matrices are
+    dropped on the fly, so memory is proportional to the number of streets
+    (and the length of one row) rather than to the square of the number of
+    junctions.
+    """
+    values = {}
+    adjacency = None
+    streets = None
+    with open(filename, "r") as file:
+        stream = JSONStream(file)
+        stream.expect("{")
+        while not stream.skip("}"):
+            key = stream.read_value()
+            stream.expect(":")
+            if key == "adjacency":
+                adjacency = read_adjacency(stream)
+            elif key == "modified_adjacency" and stream.peek() == "[":
+                streets = read_modified_adjacency(stream)
+            else:
+                values[key] = stream.read_value()
+            stream.skip(",")
+    network = {key: values.get(key) for key in SCALARS}
+    network["positions"] = np.asarray(values["positions"], dtype=float).reshape(-1, 2)
+    if streets is None:
+        network["ends"] = adjacency
+        return network
+    network.update(streets)
+    return network
+
+def read_adjacency(stream):
+    """
+    This function reads the adjacency matrix row by row and returns the
+    (streets, 2) array of junctions of streets (the first junction is
+    smaller).
+    """
+    ends = []
+    for (i, row) in enumerate(stream.read_rows()):
+        columns = np.flatnonzero(np.fromstring(row, dtype=np.int64, sep=","))
+        columns = columns[columns > i]
+        ends.append(np.stack((np.full(len(columns), i), columns), axis=1))
+    return np.concatenate(ends + [np.zeros((0, 2), dtype=np.int64)]).astype(np.int64)
+
+def read_modified_adjacency(stream):
+    """
+    This function reads the modified adjacency matrix row by row and returns
+    the dictionary of ends and arrays of street values. Only objects of
+    streets are decoded and their columns are counted from commas between
+    them.
+    """
+    ends = []
+    values = {key: [] for key in STREETS}
+    for (i, row) in enumerate(stream.read_rows()):
+        (column, end) = (0, 0)
+        for match in STREET_PATTERN.finditer(row):
+            column += row.count(",", end, match.start())
+            end = match.end()
+            if column <= i: # every street is read once
+                continue
+            street = json.loads(match.group())
+            ends.append((i, column))
+            for key in STREETS:
+                values[key].append(street[key[:-1]])
+    streets = {"ends": np.array(ends, dtype=np.int64).reshape(-1, 2)}
+    for key in STREETS:
+        streets[key] = np.array(values[key],
+                                dtype=np.int64 if key == "orientations" else float)
+    return streets
+
+def json_to_binary(source, target):
+    """
+    This function converts the JSON file of the network to the binary file.
+    """
+    save_network(target, read_json(source))
+
+def binary_to_json(source, target):
+    """
+    This function converts the binary file of the network to the JSON file.
+    """
+    outvalues = to_json(load_network(source))
+    with open(target, "w") as file:
+        json.dump(outvalues, file)
+
+def main(arguments=None):
+    """
+    This function converts the network file given by command line arguments
+    (the direction of conversion is given by the format of the source).
+    """
+    parser = argparse.ArgumentParser(description="Conversion of network files.")
+    parser.add_argument("source", help="JSON or binary (.npz) network file")
+    parser.add_argument("target", help="converted network file")
+    arguments = parser.parse_args(arguments)
+    if is_binary(arguments.source):
+        binary_to_json(arguments.source, arguments.target)
+    else:
+        json_to_binary(arguments.source, arguments.target)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
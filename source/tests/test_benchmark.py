@@ -0,0 +1,28 @@
+from unittest import TestCase
+from source import benchmark
+
+class TestBenchmark(TestCase):
+    def test_build_network(self):
+        network = benchmark.build_network(4, 2)
+        adjacency = network.get_adjacency()
+        self.assertEqual(len(adjacency), 16)
+        self.assertEqual(adjacency[5][6], 0)
+        self.assertEqual(adjacency[9][10], 0)
+        with self.assertRaises(ValueError):
+            benchmark.build_network(3, 2)
+
+    def test_run_compare(self):
+        results = benchmark.run([3], 0, [0], [0], ["paths", "integrate", "solve"], 1)
+        self.assertEqual([result["stage"] for result in results["results"]],
+                         ["paths", "integrate", "solve"])
+        for result in results["results"]:
+            self.assertEqual(result["paths"], 1) # shortest path of the grid
+            self.assertGreater(result["seconds"], 0)
+        self.assertEqual(benchmark.compare(results, results, 0.2), [])
+        slower = {"results": [dict(result, seconds=result["seconds"]*10+1)
+                              for result in results["results"]]}
+        self.assertEqual(len(benchmark.compare(slower, results, 0.2)), 3)
+        # Paths are walked with the kronrod integration
+        (result,) = benchmark.run([3], 0, [1], [0], ["walk"], 1)["results"]
+        self.assertGreater(result["seconds"], 0)
+        self.assertGreater(result["paths"], 1)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+from source.cache import Cache, compute_key
+from source.model import Model
+import json
+import os
+import tempfile
+
+with open("source/tests/fixtures.json", "r") as file:
+    invalues = json.load(file)
+
+ALPHA = invalues[0] # Alpha values set to 0
+
+class TestCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        cache = Cache(self.directory.name)
+        key = compute_key("network", (0, 1), 2)
+        self.assertEqual(key, compute_key("network", [0, 1], 2))
+        self.assertNotEqual(key, compute_key("network", (0, 1), 3))
+        self.assertIsNone(cache.get(key))
+        entry = {"paths": [[1, 0, 1]], "energies": [0.1], "errors": [1e-12]}
+        cache.put(key, entry)
+        self.assertEqual(cache.get(key), entry)
+        cache.clear()
+        self.assertIsNone(cache.get(key))
+        with self.assertRaises(ValueError):
+            Cache(self.directory.name, 0)
+
+    def test_eviction(self):
+        cache = Cache(self.directory.name, 300)
+        entry = {"paths": [list(range(20))], "energies": [0.1], "errors": [0.0]}
+        for key in ["a", "b", "c"]:
+            cache.put(key, entry)
+            os.utime(os.path.join(self.directory.name, key + ".json"),
+                     (len(key), ord(key))) # distinct times of use
+        cache.get("a") # "b" is the least recently used entry
+        cache.put("d", entry)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("d"))
+        sizes = [os.path.getsize(os.path.join(self.directory.name, name))
+                 for name in os.listdir(self.directory.name)]
+        self.assertLessEqual(sum(sizes), 300)
+
+    def test_model(self):
+        model = Model()
+        model.set_adjacency(ALPHA)
+        model.set_source(0, 1)
+        model.set_receiver(4, 5)
+        model.set_threshold(3)
+        result = model.solve()
+        cached = Model()
+        cached.set_cache(Cache(self.directory.name))
+        cached.set_adjacency(ALPHA)
+        cached.set_source(0, 1)
+        cached.set_receiver(4, 5)
+        for threshold in [1, 3, 3]: # second threshold reuses paths of the first
+            cached.set_threshold(threshold)
+            cached_result = cached.solve()
+        self.assertEqual(cached_result, result)
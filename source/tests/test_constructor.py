@@ -17,6 +17,12 @@ class TestConstructor(TestCase):
         network.set_grid(4,4,100)
         adjacency = network.get_adjacency()
         self.assertEqual(len(adjacency),16)
+        network.set_grid(3,4,100)
+        adjacency = network.get_adjacency()
+        self.assertTrue((adjacency == adjacency.T).all())
+        self.assertEqual(adjacency.sum(), 2*(3*3+2*4)) # 17 streets
+        self.assertEqual(adjacency[3][4], 0) # end of the first row
+        self.assertEqual(adjacency[3][7], 1)
 
     def test_create_positions(self):
         # Test normal usage
@@ -80,6 +86,61 @@ class TestConstructor(TestCase):
         self.assertEqual(len(positions),22)
         network.modify_adjacency(10, 0.5, 0.5)
 
+    def test_delete_renumbering(self):
+        network = Constructor()
+        network.set_grid(3,3,100)
+        network.delete_connection(1,4) # junction 1 is merged into street (0,2)
+        network.delete_connection(2,3) # junctions 3 and 4 after renumbering
+        adjacency = network.get_adjacency()
+        positions = network.get_positions()
+        self.assertEqual(len(adjacency),7)
+        self.assertEqual(adjacency[0][1],1) # merged street (0,2)
+        self.assertEqual(adjacency[0][4],1) # merged street (0,6)
+        self.assertEqual(positions[2].tolist(),[100,100])
+        with self.assertRaises(ValueError): # nodes not neighbours
+            network.delete_connection(0,2)
+
+    def test_delete_connections(self):
+        network1 = Constructor()
+        network1.set_grid(5,5,100)
+        for (i, j) in [(6,7), (7,8), (2,11), (2,6)]:
+            network1.delete_connection(i, j)
+        network2 = Constructor()
+        network2.set_grid(5,5,100)
+        network2.delete_connections([(6,7), (7,8), (2,11), (2,6)])
+        self.assertTrue((network1.get_adjacency() == network2.get_adjacency()).all())
+        self.assertTrue((network1.get_positions() == network2.get_positions()).all())
+        # Test wrong usage (no street is deleted)
+        with self.assertRaises(ValueError): # street deleted twice
+            network2.delete_connections([(0,1), (0,1)])
+        with self.assertRaises(ValueError): # nodes out of range
+            network2.delete_connections([(0,1), (0,22)])
+        self.assertTrue((network1.get_adjacency() == network2.get_adjacency()).all())
+
+    def test_change_streets(self):
+        network1 = Constructor()
+        network1.set_grid(4,4,100)
+        network1.modify_adjacency(10, 0.1, 0.1)
+        network1.change_width(0,1,20)
+        network1.change_width(1,0,30)
+        network1.change_alpha(4,5,0.5)
+        network2 = Constructor()
+        network2.set_grid(4,4,100)
+        network2.modify_adjacency(10, 0.1, 0.1)
+        network2.change_streets([(0,1), (1,0)], widths=[20, 30])
+        network2.change_streets([(4,5)], alphas=0.5)
+        self.assertEqual(network1.get_modified_adjacency(),
+                         network2.get_modified_adjacency())
+        # Test wrong usage (no street is changed)
+        with self.assertRaises(ValueError): # nodes not neighbours
+            network2.change_streets([(0,1), (0,2)], widths=[50, 50])
+        with self.assertRaises(ValueError): # alpha>1
+            network2.change_streets([(0,1), (4,5)], alphas=[0.5, 2])
+        with self.assertRaises(ValueError): # missing values
+            network2.change_streets([(0,1), (4,5)], betas=[0.5])
+        self.assertEqual(network1.get_modified_adjacency(),
+                         network2.get_modified_adjacency())
+
     def test_modify_adjacency(self):
         # Test normal usage
         network = Constructor()
@@ -99,6 +160,25 @@ class TestConstructor(TestCase):
             network.modify_adjacency(0, 0.1, 0.1)
 
 
+    def test_get_graph(self):
+        network = Constructor()
+        network.set_grid(3,4,100)
+        network.move_vertical_line(1,50)
+        self.assertIsNone(network.get_graph())
+        network.modify_adjacency(10, 0.1, 0.2)
+        network.change_width(5,1,20)
+        graph = network.get_graph()
+        self.assertEqual(graph.get_nodes(), 12)
+        self.assertEqual(graph.get_streets(), 17)
+        street = graph.get_street(0,1)
+        self.assertEqual(graph.get_lengths()[street], 150)
+        self.assertEqual(graph.get_orientations()[graph.get_edge(1,0)], 2)
+        self.assertEqual(graph.get_widths()[graph.get_street(1,5)], 20)
+        network.change_width(1,5,30) # graph is not changed
+        self.assertEqual(graph.get_widths()[graph.get_street(1,5)], 20)
+        self.assertEqual(network.get_modified_adjacency()[1][5]["width"], 30)
+        self.assertEqual(network.get_modified_adjacency()[1][0]["orientation"], 2)
+
     def test_change_width(self):
         # Test normal usage
         network = Constructor()
@@ -0,0 +1,39 @@
+from unittest import TestCase
+from source.graph import Graph, UNREACHABLE
+import json
+
+with open("source/tests/fixtures.json", "r") as file:
+    invalues = json.load(file)
+
+ALPHA = invalues[0] # Alpha values set to 0
+
+class TestGraph(TestCase):
+    def test_from_modified_adjacency(self):
+        graph = Graph.from_modified_adjacency(ALPHA)
+        self.assertEqual(graph.get_nodes(), 6)
+        self.assertEqual(graph.get_streets(), 7)
+        self.assertEqual(graph.get_neighbours(1).tolist(), [0, 2, 4])
+        self.assertTrue(graph.has_edge(0, 1))
+        self.assertTrue(graph.has_edge(1, 0))
+        self.assertFalse(graph.has_edge(0, 2))
+        self.assertFalse(graph.has_edge(5, 6)) # node out of range
+        self.assertEqual(graph.get_street(0, 1), graph.get_street(1, 0))
+        with self.assertRaises(ValueError):
+            graph.get_street(0, 2)
+
+    def test_to_modified_adjacency(self):
+        graph = Graph.from_modified_adjacency(ALPHA)
+        self.assertEqual(graph.to_modified_adjacency(), ALPHA)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError): # arrays of different lengths
+            Graph(2, [(0, 1)], [100], [5], [0.1], [0.1], [])
+        with self.assertRaises(ValueError): # nodes out of range
+            Graph(2, [(0, 2)], [100], [5], [0.1], [0.1], [0])
+
+    def test_distances(self):
+        graph = Graph.from_modified_adjacency(ALPHA)
+        self.assertEqual(graph.distances(0).tolist(), [0, 1, 2, 1, 2, 3])
+        self.assertEqual(graph.distances(4).tolist(), [2, 1, 2, 1, 0, 1])
+        graph = Graph(3, [(0, 1)], [100], [5], [0.1], [0.1], [0])
+        self.assertEqual(graph.distances(0).tolist(), [0, 1, UNREACHABLE])
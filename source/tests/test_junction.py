@@ -0,0 +1,38 @@
+from unittest import TestCase
+from source.junction import Junction, transfer, CONSTANT, CROSSING, TURNING
+import numpy as np
+
+THETA = np.linspace(0, np.pi/2, 50, endpoint=False)
+
+class TestJunction(TestCase):
+    def test_kernels(self):
+        crossroads = {"backward": 10, "forward": 10, "left": 5, "right": 5}
+        junction = Junction(dict(crossroads, next="forward"), 0)
+        self.assertEqual(junction.get_junction(), "crossroads")
+        self.assertEqual(junction.compute_kernel(), (CROSSING, 1, 1))
+        junction = Junction(dict(crossroads, next="left"), 0)
+        self.assertEqual(junction.compute_kernel(), (TURNING, 1, 0.5))
+        junction = Junction(dict(crossroads, next="backward"), 0)
+        self.assertEqual(junction.compute_kernel(), (CONSTANT, 0, 0))
+        self.assertIsNone(junction.compute_breaking_point())
+        junction = Junction({"backward": 10, "next": "backward"}, 0)
+        self.assertEqual(junction.get_junction(), "dead-end")
+        self.assertEqual(junction.compute_kernel(), (CONSTANT, 1, 0))
+
+    def test_function(self):
+        widths = {"backward": 10, "left": 5, "right": 5}
+        for following in ["left", "right", "backward"]:
+            junction = Junction(dict(widths, next=following), 0)
+            function = junction.compute_function()
+            values = function(THETA)
+            self.assertEqual(values.shape, THETA.shape)
+            for (theta, value) in zip(THETA, values):
+                self.assertAlmostEqual(function(theta), value)
+            self.assertTrue(np.all(values >= 0) and np.all(values <= 1))
+            (kernel, scale, ratio) = junction.compute_kernel()
+            np.testing.assert_allclose(transfer(kernel, scale, ratio, THETA), values)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError): # opposite streets of different widths
+            Junction({"backward": 10, "forward": 5, "left": 5, "right": 5,
+                      "next": "forward"}, 0)
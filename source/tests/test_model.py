@@ -1,6 +1,10 @@
 from unittest import TestCase
 from source.model import Model
+from source.graph import Graph
+from source.constructor import Constructor
 import json
+import pickle
+import threading
 
 with open("source/tests/fixtures.json", "r") as file:
     invalues = json.load(file)
@@ -91,3 +95,300 @@ class TestModel(TestCase):
 
         (power, error, paths) = model.solve()
         self.assertEqual(len(paths), 2)
+
+    def test_sparse_graph(self):
+        model = Model()
+        model.set_adjacency(Graph.from_modified_adjacency(BETA))
+        self.assertEqual(model.get_modified_adjacency(), BETA)
+        model.set_source(0, 3)
+        model.set_receiver(2, 5)
+        model.set_threshold(0)
+        (power, error, paths) = model.solve()
+        self.assertEqual(len(paths), 2)
+
+    def test_long_paths(self):
+        # Paths longer than the recursion limit
+        nodes = 1100
+        ends = [(i, i+1) for i in range(nodes-1)]
+        ones = [1]*(nodes-1)
+        model = Model()
+        model.set_adjacency(Graph(nodes, ends, ones, ones, [0]*(nodes-1),
+                                  ones, [0]*(nodes-1)))
+        model.set_source(0, 1)
+        model.set_receiver(nodes-2, nodes-1)
+        model.set_threshold(0)
+        (power, error, paths) = model.solve()
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(len(paths[0]), nodes)
+
+    def test_output(self):
+        model = Model()
+        model.set_adjacency(WIDTH)
+        model.set_source(0, 1)
+        model.set_receiver(4, 5)
+        model.set_threshold(2)
+        (power, error, paths) = model.solve()
+        (count_power, count_error, count) = model.solve(output="count")
+        self.assertEqual(count, len(paths))
+        self.assertAlmostEqual(count_power, power)
+        self.assertAlmostEqual(count_error, error)
+        (top_power, top_error, strongest) = model.solve(output="top", top=3)
+        self.assertEqual(len(strongest), 3)
+        self.assertAlmostEqual(top_power, power)
+        energies = [energy for (energy, path) in strongest]
+        self.assertEqual(energies, sorted(energies, reverse=True))
+        with self.assertRaises(ValueError):
+            model.solve(output="everything")
+
+    def test_integration(self):
+        network = Constructor()
+        network.set_grid(3, 3, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_adjacency(network.get_modified_adjacency())
+        model.set_source(0, 1)
+        model.set_receiver(7, 8)
+        model.set_threshold(1)
+        for height in [0, 10]:
+            model.set_height(height)
+            model.set_integration("quad")
+            (quad_power, quad_error, count) = model.solve(output="count")
+            model.set_integration("kronrod")
+            (power, error, count) = model.solve(output="count")
+            self.assertGreater(power, 0)
+            self.assertLessEqual(abs(power - quad_power), quad_error)
+            for integration in ["batch", "prefix"]:
+                model.set_integration(integration)
+                (grid_power, grid_error, count) = model.solve(output="count")
+                self.assertLessEqual(abs(grid_power - power), 1e-8*power)
+
+    def test_prefix_paths(self):
+        model = Model()
+        model.set_adjacency(ALPHA)
+        model.set_source(0, 1)
+        model.set_receiver(4, 5)
+        model.set_threshold(3)
+        model.set_integration("kronrod")
+        (power, error, paths) = model.solve()
+        model.set_integration("prefix")
+        (prefix_power, prefix_error, prefix_paths) = model.solve()
+        self.assertEqual(prefix_paths, paths)
+        with self.assertRaises(ValueError):
+            model.set_integration("simpson")
+
+    def test_prefix_grid(self):
+        network = Constructor()
+        network.set_grid(5, 5, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        network.change_streets([(0, 1), (1, 2), (2, 3), (3, 4)], widths=10)
+        model = Model()
+        model.set_adjacency(network.get_graph())
+        model.set_source(0, 1)
+        model.set_receiver(23, 24)
+        model.set_threshold(2)
+        for height in [0, 10]:
+            model.set_height(height)
+            model.set_integration("kronrod")
+            (power, error, count) = model.solve(output="count")
+            model.set_integration("prefix")
+            (prefix_power, prefix_error, prefix_count, report) = model.solve(
+                output="count", profile=True)
+            self.assertLessEqual(abs(prefix_power - power), 1e-12*power)
+            # No path falls back to walking and integrating on its own panels
+            self.assertNotIn("walk", report["stages"])
+            self.assertEqual(len(set(report["evaluations"])), 1)
+
+    def test_heterogeneous_widths(self):
+        # Every row and column has its own width, so the grid of angles split
+        # at breaking points of all junctions is too large to be shared
+        size = 7
+        network = Constructor()
+        network.set_grid(size, size, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        streets = []
+        widths = []
+        for i in range(size):
+            for j in range(size-1):
+                streets += [(i*size+j, i*size+j+1), (j*size+i, (j+1)*size+i)]
+                widths += [5+0.37*i, 5+0.53*i]
+        network.change_streets(streets, widths=widths)
+        model = Model()
+        model.set_adjacency(network.get_graph())
+        model.set_source(0, 1)
+        model.set_receiver(size+1, size+2)
+        model.set_threshold(2)
+        model.set_integration("kronrod")
+        (power, error, count) = model.solve(output="count")
+        model.set_integration("prefix")
+        (prefix_power, prefix_error, prefix_count, report) = model.solve(
+            output="count", profile=True)
+        self.assertEqual((prefix_power, prefix_error), (power, error))
+        self.assertEqual(report["stages"]["walk"]["calls"], count) # own panels
+        model.set_threshold(0)
+        (X, Y, Z) = model.solve_all(network.get_positions())
+        for engine in ["source", "transfer"]:
+            model.set_engine(engine)
+            (engine_X, engine_Y, engine_Z) = model.solve_all(network.get_positions())
+            self.assertEqual((engine_X, engine_Y), (X, Y))
+            for (engine_power, power) in zip(engine_Z, Z):
+                self.assertLessEqual(abs(engine_power - power), 1e-12*power)
+
+    def test_junctions(self):
+        network = Constructor()
+        network.set_grid(3, 3, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        network.change_width(4, 5, 10) # crossroads 4 is not implemented
+        model = Model()
+        model.set_adjacency(network.get_modified_adjacency())
+        model.set_source(0, 1)
+        model.set_receiver(0, 3)
+        model.set_threshold(0)
+        (power, error, paths) = model.solve() # paths avoid junction 4
+        self.assertEqual(len(paths), 1)
+        model.set_receiver(7, 8)
+        for integration in ["prefix", "batch", "kronrod", "quad"]:
+            model.set_integration(integration)
+            with self.assertRaises(ValueError):
+                model.solve()
+
+    def test_tracking(self):
+        network = Constructor()
+        network.set_grid(3, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_tracking(True)
+        model.set_integration("kronrod")
+        model.set_adjacency(network.get_modified_adjacency())
+        model.set_source(0, 1)
+        model.set_receiver(10, 11)
+        model.set_threshold(2)
+        model.solve()
+        network.change_alpha(5, 6, 0.2)
+        network.change_beta(1, 5, 0.01)
+        network.change_width(2, 6, 3)
+        network.change_width(6, 10, 3)
+        model.set_adjacency(network.get_modified_adjacency()) # streets are changed
+        for (i, j) in [(0, 4), (4, 8)]:
+            model.change_width(i, j, 7)
+            network.change_width(i, j, 7)
+        fresh = Model()
+        fresh.set_integration("kronrod")
+        fresh.set_adjacency(network.get_modified_adjacency())
+        fresh.set_source(0, 1)
+        fresh.set_receiver(10, 11)
+        fresh.set_threshold(2)
+        self.assertEqual(model.solve(), fresh.solve())
+        with self.assertRaises(ValueError):
+            model.change_alpha(4, 8, 2)
+        with self.assertRaises(ValueError):
+            model.change_width(0, 5, 5) # junctions are not neighbours
+
+    def test_tracking_receivers(self):
+        network = Constructor()
+        network.set_grid(3, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_tracking(True)
+        model.set_adjacency(network.get_graph())
+        model.set_source(0, 1)
+        model.set_threshold(1)
+        model.solve_all(network.get_positions()) # receivers are not tracked
+        model.set_receiver(10, 11)
+        (power, error, count, report) = model.solve(output="count", profile=True)
+        self.assertIn("paths", report["stages"])
+        (power, error, count, report) = model.solve(output="count", profile=True)
+        self.assertNotIn("paths", report["stages"]) # tracked solution
+        worker = pickle.loads(pickle.dumps(model)) # tracking is disabled
+        worker.solve(output="count")
+        (power, error, count, report) = worker.solve(output="count", profile=True)
+        self.assertIn("paths", report["stages"])
+
+    def test_logging(self):
+        model = Model()
+        model.set_adjacency(ALPHA)
+        model.set_source(0, 1)
+        model.set_receiver(4, 5)
+        model.set_threshold(1)
+        with self.assertLogs("source.model", level="INFO") as logs:
+            (power, error, count) = model.solve(output="count")
+        self.assertEqual(len(logs.records), 1) # only the summary
+        self.assertIn("{} paths".format(count), logs.output[0])
+        with self.assertLogs("source.model", level="DEBUG") as logs:
+            model.solve(output="count")
+        self.assertEqual(len(logs.records), count+1)
+
+    def test_parallel_solve_all(self):
+        network = Constructor()
+        network.set_grid(3, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_adjacency(network.get_modified_adjacency())
+        model.set_source(0, 1)
+        model.set_threshold(1)
+        results = model.solve_all(network.get_positions())
+        self.assertEqual(model.solve_all(network.get_positions(), processes=2), results)
+        parallel = []
+        thread = threading.Thread(target=lambda: parallel.append(
+            model.solve_all(network.get_positions(), processes=2))) # as in the GUI
+        thread.start()
+        thread.join()
+        self.assertEqual(parallel, [results])
+        with self.assertRaises(ValueError):
+            model.solve_all(network.get_positions(), processes=0)
+
+    def test_source_engine(self):
+        network = Constructor()
+        network.set_grid(3, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_adjacency(network.get_modified_adjacency())
+        model.set_source(0, 1)
+        for (threshold, height) in [(0, 0), (2, 0), (2, 10)]:
+            model.set_threshold(threshold)
+            model.set_height(height)
+            model.set_engine("paths")
+            (X, Y, Z) = model.solve_all(network.get_positions())
+            model.set_engine("source")
+            (source_X, source_Y, source_Z) = model.solve_all(network.get_positions())
+            self.assertEqual((source_X, source_Y), (X, Y))
+            for (source_power, power) in zip(source_Z, Z):
+                self.assertLessEqual(abs(source_power - power), 1e-12*power)
+        with self.assertRaises(ValueError):
+            model.set_engine("receivers")
+
+    def test_source_fallbacks(self):
+        network = Constructor()
+        network.set_grid(4, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        model = Model()
+        model.set_adjacency(network.get_graph())
+        model.set_source(0, 1)
+        model.set_threshold(3)
+        model.set_engine("source")
+        for height in [0, 10]:
+            model.set_height(height)
+            with self.assertLogs("source.model", level="INFO") as logs:
+                model.solve_all(network.get_positions())
+            (walks, source, fallbacks) = [record.args for record in logs.records
+                                          if record.msg.startswith("Integrated")][0]
+            self.assertGreater(walks, 0)
+            # Few walks fall back to integration on their own panels
+            self.assertLess(fallbacks, 0.05*walks)
+
+    def test_transfer_engine(self):
+        positions = [[0, 0], [100, 0], [200, 0], [0, 100], [100, 100], [200, 100]]
+        for modified_adjacency in [ALPHA, BETA, WIDTH]:
+            model = Model()
+            model.set_adjacency(modified_adjacency)
+            model.set_source(0, 1)
+            model.set_threshold(3)
+            model.set_integration("kronrod")
+            (X, Y, Z) = model.solve_all(positions)
+            model.set_engine("transfer")
+            (transfer_X, transfer_Y, transfer_Z) = model.solve_all(positions)
+            self.assertEqual((transfer_X, transfer_Y), (X, Y))
+            for (transfer_power, power) in zip(transfer_Z, Z):
+                self.assertLessEqual(abs(transfer_power - power), 1e-8*power)
+        model.set_height(10)
+        with self.assertRaises(ValueError): # 3D is not implemented
+            model.solve_all(positions)
@@ -0,0 +1,97 @@
+import multiprocessing
+from unittest import TestCase
+from source.monitor import Monitor, ProgressMonitor, Cancelled
+from source.model import Model, initialize_worker, solve_receivers
+from source.constructor import Constructor
+
+class CancellingMonitor(Monitor):
+    """
+    This monitor records reports and cancels the computation after the given
+    number of paths or receivers.
+    """
+    def __init__(self, paths=None, receivers=None, count_paths=False):
+        super(CancellingMonitor, self).__init__(count_paths=count_paths)
+        self.paths = paths
+        self.receivers = receivers
+        self.energies = []
+        self.solved = []
+
+    def path_integrated(self, path, energy, error, done, total):
+        self.energies.append(energy)
+        if done == self.paths:
+            self.get_token().cancel()
+
+    def receiver_solved(self, receiver, result, elapsed, done, total):
+        self.solved.append((receiver, result))
+        self.total = total
+        if done == self.receivers:
+            self.get_token().cancel()
+
+class TestMonitor(TestCase):
+    def setUp(self):
+        self.network = Constructor()
+        self.network.set_grid(3, 4, 100)
+        self.network.modify_adjacency(5, 0.04, 0.001)
+        self.model = Model()
+        self.model.set_adjacency(self.network.get_modified_adjacency())
+        self.model.set_source(0, 1)
+        self.model.set_receiver(10, 11)
+        self.model.set_threshold(2)
+
+    def test_progress(self):
+        monitor = ProgressMonitor(count_paths=True)
+        self.model.set_monitor(monitor)
+        (power, error, count) = self.model.solve(output="count")
+        self.assertEqual(monitor.get_progress(), {"paths": (count, count)})
+        self.assertEqual(monitor.get_eta("paths"), 0)
+        self.assertIsNone(monitor.get_eta("receivers"))
+        monitor = ProgressMonitor() # paths are not counted in advance
+        self.model.set_monitor(monitor)
+        self.model.solve(output="count")
+        self.assertEqual(monitor.get_progress(), {"paths": (count, None)})
+        self.assertIsNone(monitor.get_eta("paths"))
+
+    def test_cancel_counting(self):
+        monitor = CancellingMonitor(count_paths=True)
+        monitor.get_token().cancel()
+        self.model.set_monitor(monitor)
+        with self.assertRaises(Cancelled) as context:
+            self.model.solve()
+        self.assertEqual(context.exception.partial, (0, 0, 0))
+        self.assertEqual(monitor.energies, []) # no path is integrated
+
+    def test_cancel_solve(self):
+        monitor = CancellingMonitor(paths=5)
+        self.model.set_monitor(monitor)
+        with self.assertRaises(Cancelled) as context:
+            self.model.solve()
+        (power, error, count) = context.exception.partial
+        self.assertEqual(count, 5)
+        self.assertAlmostEqual(power, sum(monitor.energies))
+
+    def test_cancel_solve_all(self):
+        monitor = CancellingMonitor(receivers=3)
+        self.model.set_monitor(monitor)
+        self.model.set_threshold(0)
+        with self.assertRaises(Cancelled) as context:
+            self.model.solve_all(self.network.get_positions())
+        self.assertEqual(context.exception.partial, dict(monitor.solved))
+        self.assertEqual(len(monitor.solved), 3)
+
+    def test_cancel_worker(self):
+        cancelled = multiprocessing.get_context("spawn").Event()
+        initialize_worker(self.model, cancelled)
+        batch = [(1, 2), (10, 11)]
+        self.assertEqual(len(solve_receivers(batch)), 2)
+        cancelled.set()
+        self.assertEqual(solve_receivers(batch), []) # stops before the first path
+
+    def test_cancel_solve_all_parallel(self):
+        monitor = CancellingMonitor(receivers=1)
+        self.model.set_monitor(monitor)
+        self.model.set_threshold(0)
+        with self.assertRaises(Cancelled) as context:
+            self.model.solve_all(self.network.get_positions(), processes=2)
+        self.assertEqual(context.exception.partial, dict(monitor.solved))
+        self.assertGreaterEqual(len(monitor.solved), 1)
+        self.assertLess(len(monitor.solved), monitor.total)
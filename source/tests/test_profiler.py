@@ -0,0 +1,35 @@
+from unittest import TestCase
+from source.profiler import Profiler
+from source.model import Model
+from source.constructor import Constructor
+
+class TestProfiler(TestCase):
+    def test_stages(self):
+        profiler = Profiler()
+        with profiler.stage("outer"):
+            items = list(profiler.iterate("inner", range(3)))
+        profiler.count(15)
+        profiler.finish_path()
+        report = profiler.get_report()
+        self.assertEqual(items, [0, 1, 2])
+        self.assertEqual(report["stages"]["outer"]["calls"], 1)
+        self.assertEqual(report["stages"]["inner"]["calls"], 4) # last call stops
+        self.assertEqual(report["evaluations"], [15])
+
+    def test_model(self):
+        network = Constructor()
+        network.set_grid(3, 4, 100)
+        network.modify_adjacency(5, 0.04, 0.001)
+        for integration in ["prefix", "batch", "kronrod", "quad"]:
+            model = Model()
+            model.set_adjacency(network.get_modified_adjacency())
+            model.set_source(0, 1)
+            model.set_receiver(10, 11)
+            model.set_threshold(1)
+            model.set_integration(integration)
+            (power, error, count, report) = model.solve(output="count", profile=True)
+            self.assertEqual(model.solve(output="count"), (power, error, count))
+            self.assertEqual(len(report["evaluations"]), count)
+            self.assertTrue(all(evaluations > 0 for evaluations in report["evaluations"]))
+            self.assertLessEqual({"distances", "paths", "integrate"}, set(report["stages"]))
+            self.assertEqual(report["stages"]["paths"]["calls"], count + 4)
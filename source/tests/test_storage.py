@@ -0,0 +1,138 @@
+from unittest import TestCase
+from source.constructor import Constructor
+from source import storage
+import io
+import json
+import os
+import tempfile
+import numpy as np
+
+class TestStorage(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.network = Constructor()
+        self.network.set_grid(4,5,100)
+        self.network.move_vertical_line(1,-30)
+        self.network.delete_connection(6,11)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_save_load(self):
+        for modified in [False, True]:
+            if modified:
+                self.network.modify_adjacency(5, 0.04, 0.001)
+                self.network.change_width(0,1,20)
+            self.network.save_network(self.path("network.npz"))
+            loaded = Constructor()
+            loaded.load_network(self.path("network.npz"))
+            self.assertTrue((loaded.get_adjacency() == self.network.get_adjacency()).all())
+            self.assertTrue((loaded.get_positions() == self.network.get_positions()).all())
+            self.assertEqual(loaded.get_modified_adjacency(),
+                             self.network.get_modified_adjacency())
+            self.assertEqual(loaded.get_stage(), self.network.get_stage())
+        loaded.change_alpha(0,1,0.5) # values of memory-mapped files are copied
+        self.assertEqual(loaded.get_modified_adjacency()[0][1]["alpha"], 0.5)
+
+    def test_unsorted_streets(self):
+        self.network.modify_adjacency(5, 0.04, 0.001)
+        self.network.change_width(0,1,20)
+        self.network.save_network(self.path("network.npz"))
+        network = storage.load_network(self.path("network.npz"), mmap=False)
+        # Streets of other writers may be reversed and in any order
+        order = np.random.RandomState(0).permutation(len(network["ends"]))
+        for key in ["ends"] + storage.STREETS:
+            network[key] = network[key][order]
+        network["ends"][::2] = network["ends"][::2, ::-1]
+        network["orientations"][::2] = (network["orientations"][::2]+2) % 4
+        storage.save_network(self.path("unsorted.npz"), network)
+        loaded = Constructor()
+        loaded.load_network(self.path("unsorted.npz"))
+        self.assertEqual(loaded.get_modified_adjacency(),
+                         self.network.get_modified_adjacency())
+        loaded.change_streets([(1,0), (5,0)], widths=7)
+        self.network.change_streets([(1,0), (5,0)], widths=7)
+        self.assertEqual(loaded.get_modified_adjacency(),
+                         self.network.get_modified_adjacency())
+        network["ends"][1] = network["ends"][0] # duplicated street
+        storage.save_network(self.path("duplicated.npz"), network)
+        with self.assertRaises(ValueError):
+            loaded.load_network(self.path("duplicated.npz"))
+        self.assertEqual(loaded.get_modified_adjacency(), # network is kept
+                         self.network.get_modified_adjacency())
+
+    def test_memory_map(self):
+        self.network.modify_adjacency(5, 0.04, 0.001)
+        self.network.save_network(self.path("network.npz"))
+        network = storage.load_network(self.path("network.npz"))
+        self.assertIsInstance(network["ends"], np.memmap)
+        self.assertEqual(network["nodes"], 20)
+        self.assertEqual(len(network["widths"]), len(network["ends"]))
+        with self.assertRaises(ValueError):
+            np.savez_compressed(self.path("compressed.npz"), ends=network["ends"])
+            storage.load_arrays(self.path("compressed.npz"))
+
+    def test_read_json(self):
+        for modified in [False, True]:
+            if modified:
+                self.network.modify_adjacency(5, 0.04, 0.001)
+                self.network.change_beta(1,2,0.01)
+            self.network.export_network(self.path("network.json"))
+            with open(self.path("network.json"), "r") as file:
+                expected = storage.from_json(json.load(file))
+            chunk_size = storage.CHUNK_SIZE
+            storage.CHUNK_SIZE = 7 # values span several chunks
+            try:
+                network = storage.read_json(self.path("network.json"))
+            finally:
+                storage.CHUNK_SIZE = chunk_size
+            self.assertEqual(set(network), set(expected))
+            for key in expected:
+                self.assertTrue(np.array_equal(network[key], expected[key]))
+            loaded = Constructor()
+            loaded.load_network(self.path("network.json"))
+            self.assertEqual(loaded.get_modified_adjacency(),
+                             self.network.get_modified_adjacency())
+
+    def test_json_stream(self):
+        chunk_size = storage.CHUNK_SIZE
+        storage.CHUNK_SIZE = 1 # whitespace spans chunks
+        try:
+            stream = storage.JSONStream(io.StringIO(' [ {"a": 1} ,\n 2 ]  \n'))
+            stream.expect("[")
+            self.assertEqual(stream.read_value(), {"a": 1})
+            self.assertTrue(stream.skip(","))
+            self.assertEqual(stream.read_value(), 2)
+            stream.expect("]")
+            self.assertEqual(stream.peek(), "") # end of the file
+            self.assertFalse(stream.skip(" "))
+        finally:
+            storage.CHUNK_SIZE = chunk_size
+
+    def test_detect_format(self):
+        self.network.modify_adjacency(5, 0.04, 0.001)
+        self.network.export_network(self.path("network.JSON"))
+        os.rename(self.path("network.JSON"), self.path("legacy"))
+        self.network.save_network(self.path("network.bin"))
+        for name in ["legacy", "network.bin"]: # the format is read from the content
+            loaded = Constructor()
+            loaded.load_network(self.path(name))
+            self.assertEqual(loaded.get_modified_adjacency(),
+                             self.network.get_modified_adjacency())
+        storage.main([self.path("legacy"), self.path("converted.npz")])
+        self.assertTrue(storage.is_binary(self.path("converted.npz")))
+        self.assertFalse(storage.is_binary(self.path("legacy")))
+
+    def test_convert(self):
+        self.network.modify_adjacency(5, 0.04, 0.001)
+        self.network.export_network(self.path("network.json"))
+        storage.json_to_binary(self.path("network.json"), self.path("network.npz"))
+        storage.binary_to_json(self.path("network.npz"), self.path("converted.json"))
+        with open(self.path("network.json"), "r") as file:
+            original = json.load(file)
+        with open(self.path("converted.json"), "r") as file:
+            converted = json.load(file)
+        self.assertEqual(converted, original)
@@ -36,6 +36,9 @@ class View(tk.Tk):
         self.menu = Menu(self)
         self.config(menu=self.menu)
 
+        self.status = tk.Label(self, anchor=tk.W, **FRAME_OPTIONS)
+        self.status.pack(side=tk.BOTTOM, fill=tk.X)
+
         self.canvas = Canvas(self, height=100, width=WIDTH, bg=CANVAS_BACKGROUND)
         self.canvas.pack(fill=tk.BOTH, expand=tk.YES)
 
@@ -109,6 +112,12 @@ class View(tk.Tk):
         """
         messagebox.showinfo(title, message)
 
+    def show_status(self, message):
+        """
+        This method displays the message in the status bar.
+        """
+        self.status.configure(text=message)
+
     def save_as(self, extension):
         """
         This method displays the file dialog box to save file and returns the